@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from report import build_report, iter_page, year_values
+from schema import hepatitis_b_columns, profile_columns
+from sheet import PersonRecord, load_sheet, read_snapshot, write_snapshot
+from store import MetricStore
+
+# ==================== BATCH REPORTS ====================
+# พิมพ์รายงานทั้งหน่วยงาน/ทั้งปี/ทั้งชีตเป็นไฟล์ HTML โดยไม่ต้องเปิด UI
+#   python batch.py --out reports --department "ฝ่ายการพยาบาล" --year 68 --workers 8
+# ไม่ระบุ --credentials และไม่มี GCP_SERVICE_ACCOUNT ใน env จะใช้ snapshot ล่าสุดบนดิสก์
+
+BATCH_CHUNK = 50  # จำนวนรายงานต่องานที่ส่งให้แต่ละ process
+
+_worker = {}
+
+
+def _load_frame(credentials=None):
+    if credentials:
+        with open(credentials, encoding="utf-8") as f:
+            return load_sheet(json.load(f))
+    if os.environ.get("GCP_SERVICE_ACCOUNT"):
+        return load_sheet(json.loads(os.environ["GCP_SERVICE_ACCOUNT"]))
+    df = read_snapshot()
+    if df is None:
+        sys.exit("ไม่พบ snapshot ของชีต ระบุ --credentials หรือ GCP_SERVICE_ACCOUNT")
+    return df
+
+
+def select_rows(df, store, year, department=None):
+    # เฉพาะคนที่มีผลตรวจปีนั้น (ไม่พิมพ์รายงานเปล่า)
+    mask = store.has_results(year)
+    if department:
+        mask &= (df["หน่วยงาน"].astype(str).str.strip() == department.strip()).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def _file_name(person, row, year):
+    hn = re.sub(r"[^\w.-]+", "_", person.hn)
+    return f"{row:05d}_{hn}_{year + 2500}.html"
+
+
+def _init_worker(frame_path, year, out_dir):
+    # ทุก process map ไฟล์ Arrow เดียวกัน ไม่ต้องส่ง DataFrame ข้าม process
+    df = read_snapshot(frame_path)
+    person_columns = [col for col in profile_columns + hepatitis_b_columns if col in df.columns]
+    _worker.update(people=df[person_columns], store=MetricStore(df), year=year, out_dir=out_dir)
+
+
+def _render_chunk(rows):
+    people, store, year = _worker["people"], _worker["store"], _worker["year"]
+    for row in rows:
+        person = PersonRecord.from_frame(people, row)
+        report = build_report(person, year_values(store, row, year), year)
+        path = os.path.join(_worker["out_dir"], _file_name(person, row, year))
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(iter_page(report, title=f"รายงานผลการตรวจสุขภาพ {person.name}"))
+    return len(rows)
+
+
+def run(df, out_dir, department=None, year=None, workers=None, chunk=BATCH_CHUNK, progress=sys.stderr):
+    store = MetricStore(df)
+    if year is not None and year not in store.years:
+        raise ValueError(f"ไม่มีข้อมูลปี {year} (มี {store.years})")
+    report_year = store.years[-1] if year is None else year
+    rows = select_rows(df, store, report_year, department)
+    os.makedirs(out_dir, exist_ok=True)
+
+    tmp_dir = tempfile.mkdtemp(prefix="batch-")
+    frame_path = os.path.join(tmp_dir, "frame.arrow")
+    write_snapshot(df, frame_path)
+    chunks = [rows[i:i + chunk] for i in range(0, len(rows), chunk)]
+    done, start = 0, time.perf_counter()
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(frame_path, report_year, out_dir)) as pool:
+            for count in pool.imap_unordered(_render_chunk, chunks):
+                done += count
+                rate = done / (time.perf_counter() - start)
+                print(f"\r{done}/{len(rows)} รายงาน ({rate:.1f} รายงาน/วินาที)", end="", file=progress, flush=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed else 0.0
+    print(f"\nเสร็จ {done} รายงาน ปี {report_year + 2500} ใน {elapsed:.1f} วินาที ({rate:.1f} รายงาน/วินาที) -> {out_dir}", file=progress)
+    return {"reports": done, "seconds": elapsed, "reports_per_second": rate}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างรายงานผลตรวจสุขภาพเป็นไฟล์ HTML ทีละหลายคน")
+    parser.add_argument("--out", required=True, help="โฟลเดอร์ที่เก็บไฟล์ HTML")
+    parser.add_argument("--department", help="เฉพาะหน่วยงานนี้ (คอลัมน์ หน่วยงาน)")
+    parser.add_argument("--year", type=int, help="ปีของรายงาน เช่น 68 ไม่ระบุ = ปีล่าสุด (เฉพาะคนที่มีผลตรวจปีนั้น)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="จำนวน process")
+    parser.add_argument("--chunk", type=int, default=BATCH_CHUNK, help="จำนวนรายงานต่องาน")
+    parser.add_argument("--credentials", help="ไฟล์ JSON ของ service account")
+    args = parser.parse_args(argv)
+
+    df = _load_frame(args.credentials)
+    try:
+        run(df, args.out, args.department, args.year, args.workers, args.chunk)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
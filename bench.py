@@ -0,0 +1,253 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from fake_sheet import FakeWorksheet
+from report import ReportCache, build_report, render_page, year_values
+from rules import interpret_cohort
+from schema import is_report_column
+from search import SearchIndex
+from sheet import PersonRecord, SheetSync, optimize_dtypes, prepare_frame, read_snapshot, records_to_frame
+from store import MetricStore
+from synthetic import generate
+
+# ==================== BENCHMARKS ====================
+# benchmark แบบ offline ผลเป็น JSON เทียบข้ามเวอร์ชันได้
+#   python bench.py render --snapshot sheet_snapshot.arrow --reports 200   (ข้อมูลจริงจาก snapshot)
+#   python bench.py suite --rows 1000 10000 100000 --out bench.json       (ชีตสังเคราะห์ + FakeWorksheet)
+#   python bench.py compare old.json new.json                             (ช้าลงเกิน --threshold = exit 1)
+
+SHEET_MAX_ROWS = 10000  # FakeWorksheet เก็บเซลล์เป็น list ของ str ชีตใหญ่กว่านี้จับเวลาโหลดที่ขนาดนี้แทน
+SAMPLE_PEOPLE = 50
+
+
+def _timed(fn, repeat):
+    # คืนเวลาที่ดีที่สุดจาก repeat รอบ (วินาที)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _once(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_render(df, reports=200, year=None, repeat=5, store=None):
+    # สร้างรายงาน (build_report) กับต่อเป็นหน้า HTML (render_page) แยกเวลากัน
+    store = store or MetricStore(df)
+    year = year or max(store.years)
+    rows = np.flatnonzero(store.has_results(year))[:reports]
+    inputs = [(PersonRecord.from_frame(df, row), year_values(store, row, year)) for row in rows]
+
+    built = []
+    build = _timed(lambda: built.__setitem__(slice(None), [build_report(p, v, year) for p, v in inputs]), repeat)
+    pages = []
+    render = _timed(lambda: pages.__setitem__(slice(None), [render_page(report) for report in built]), repeat)
+
+    n = max(len(inputs), 1)
+    return {
+        "reports": len(inputs),
+        "year": year,
+        "build_us_per_report": build / n * 1e6,
+        "render_us_per_report": render / n * 1e6,
+        "fragment_bytes_per_report": sum(
+            len(part) for report in built for _, columns in report.blocks for column in columns for part in column
+        ) / n,
+        "page_bytes_per_report": sum(len(page.encode()) for page in pages) / n,
+    }
+
+
+def bench_load(sheet):
+    # sync ครั้งแรก (ดาวน์โหลดทั้งชีต) กับครั้งถัดไปที่ชีตไม่เปลี่ยน จาก FakeWorksheet
+    rows = min(len(sheet), SHEET_MAX_ROWS)
+    worksheet = FakeWorksheet.from_frame(sheet.iloc[:rows])
+    sync = SheetSync(select=is_report_column)
+    _, cold = _once(lambda: sync.sync(worksheet))
+    _, warm = _once(lambda: sync.sync(worksheet))
+    return {"rows": rows, "cold_s": cold, "unchanged_s": warm, "cells_downloaded": worksheet.cells_downloaded}
+
+
+def bench_lookup(df, rng, queries=1000):
+    index, build = _once(lambda: SearchIndex(df))
+    picks = rng.integers(0, len(df), size=queries)
+    cases = {
+        "id": [(df["เลขบัตรประชาชน"].iat[i], "", "") for i in picks],
+        "hn": [("", df["HN"].iat[i], "") for i in picks],
+        "name": [("", "", df["ชื่อ-สกุล"].iat[i]) for i in picks],
+    }
+    out = {"index_build_s": build}
+    for name, args in cases.items():
+        elapsed = _timed(lambda: [index.find(*a) for a in args], 3)
+        out[f"find_{name}_us"] = elapsed / queries * 1e6
+    # ชื่อแบบใกล้เคียง: ตัดตัวอักษรท้ายทิ้งหนึ่งตัว (พิมพ์ไม่ครบ)
+    partial = [name[:-1] for _, _, name in cases["name"]]
+    elapsed = _timed(lambda: [index.candidates("", "", name) for name in partial], 3)
+    out["candidates_name_us"] = elapsed / queries * 1e6
+    # เลขที่พิมพ์ได้ครึ่งเดียว -> ค่าแนะนำที่ขึ้นต้นด้วยเลขนั้น
+    prefixes = [("เลขบัตรประชาชน", a[0][:6]) for a in cases["id"]] + [("HN", a[1][:3]) for a in cases["hn"]]
+    elapsed = _timed(lambda: [index.complete(col, prefix) for col, prefix in prefixes], 3)
+    out["complete_us"] = elapsed / len(prefixes) * 1e6
+    return out
+
+
+def bench_year_switch(df, store, rng, people=SAMPLE_PEOPLE):
+    # เปลี่ยนปีครบทุกปี: ครั้งแรกสร้างใหม่ (miss) รอบสองอ่านจาก ReportCache (hit)
+    rows = rng.choice(len(df), size=min(people, len(df)), replace=False)
+    persons = [(PersonRecord.from_frame(df, row), row) for row in rows]
+    cache = ReportCache(maxsize=len(persons) * len(store.years))
+
+    def switch():
+        for person, row in persons:
+            for year in store.years:
+                cache.get(person, year_values(store, row, year), year)
+
+    _, miss = _once(switch)
+    _, hit = _once(switch)
+    switches = len(persons) * len(store.years)
+    return {"switches": switches, "miss_us": miss / switches * 1e6, "hit_us": hit / switches * 1e6}
+
+
+def _suite_size(n, seed, repeat):
+    rng = np.random.default_rng(seed)
+    sheet, generate_s = _once(lambda: generate(n, seed=seed))
+    fetched, to_frame_s = _once(lambda: records_to_frame(sheet))
+    df, normalize_s = _once(lambda: prepare_frame(fetched))
+    df, optimize_s = _once(lambda: optimize_dtypes(df))
+    store, store_s = _once(lambda: MetricStore(df))
+    _, cohort_s = _once(lambda: interpret_cohort(df))
+    return {
+        "generate_s": generate_s,
+        "load": bench_load(sheet),
+        "records_to_frame_s": to_frame_s,
+        "normalize_s": normalize_s,
+        "optimize_dtypes_s": optimize_s,
+        "frame_bytes": df.attrs["memory"],
+        "metric_store_s": store_s,
+        "metric_store_bytes": store.nbytes,
+        "lookup": bench_lookup(df, rng),
+        "render": bench_render(df, reports=SAMPLE_PEOPLE, repeat=repeat, store=store),
+        "year_switch": bench_year_switch(df, store, rng),
+        "cohort_interpret_s": cohort_s,
+    }
+
+
+def run_suite(sizes, seed=0, repeat=3):
+    # ทีละขนาด ข้อมูลของขนาดก่อนหน้าถูกปล่อยเมื่อ _suite_size คืนค่า
+    results = {}
+    for n in sizes:
+        results[str(n)] = _suite_size(n, seed, repeat)
+        print(f"{n} แถว เสร็จ", file=sys.stderr)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta():
+    return {
+        "commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def _flatten(result, prefix=""):
+    out = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and (name.endswith("_s") or name.endswith("_us")):
+            out[name] = value
+    return out
+
+
+def compare(old, new, threshold=1.2):
+    # เทียบเฉพาะค่าเวลา (_s, _us) คืนรายการที่ช้าลงเกิน threshold เท่า
+    old_times, new_times = _flatten(old["results"]), _flatten(new["results"])
+    rows, slower = [], []
+    for name in sorted(old_times.keys() & new_times.keys()):
+        before, after = old_times[name], new_times[name]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio))
+        if ratio > threshold:
+            slower.append(name)
+    return rows, slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark รายงานสุขภาพ")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="สร้าง/ต่อ HTML รายงานจาก snapshot จริง")
+    render.add_argument("--snapshot", help="ไฟล์ Arrow snapshot (ค่าเริ่มต้น: SHEET_SNAPSHOT_PATH)")
+    render.add_argument("--reports", type=int, default=200)
+    render.add_argument("--year", type=int)
+    render.add_argument("--repeat", type=int, default=5)
+
+    suite = commands.add_parser("suite", help="ชุด benchmark บนชีตสังเคราะห์")
+    suite.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--out", help="เขียนผล JSON ลงไฟล์ (ไม่ระบุ = stdout)")
+
+    cmp = commands.add_parser("compare", help="เทียบผล suite สองไฟล์")
+    cmp.add_argument("old")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=1.2)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "render":
+        df = read_snapshot(args.snapshot) if args.snapshot else read_snapshot()
+        if df is None:
+            sys.exit("ไม่พบ snapshot ของชีต")
+        result = bench_render(df, reports=args.reports, year=args.year, repeat=args.repeat)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return result
+
+    if args.command == "suite":
+        result = {"meta": _meta(), "results": run_suite(args.rows, seed=args.seed, repeat=args.repeat)}
+        text = json.dumps(result, ensure_ascii=False, indent=2)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            print(text)
+        return result
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows, slower = compare(old, new, args.threshold)
+    for name, before, after, ratio in rows:
+        mark = " <-- ช้าลง" if name in slower else ""
+        print(f"{name:55s} {before:12.6g} -> {after:12.6g}  x{ratio:.2f}{mark}")
+    if slower:
+        sys.exit(1)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from rules import PREVALENCE_RULES, prevalence_flags
+
+# ==================== COHORT CUBE ====================
+# ภาพรวมกลุ่ม: นับ (ได้ตรวจ, ผิดปกติ) ของทุกคนครั้งเดียวต่อการโหลดชีต แล้วรวมเป็น cube
+# ระดับละเอียดสุด (ปี, หน่วยงาน, เพศ, ข้อ) ด้วย bincount การกรอง/drill-down แค่รวมแถวของ cube
+# (หลักหมื่นแถวแม้ชีตแสนแถว) ไม่ต้องแปลผลรายคนซ้ำ
+
+GROUP_COLUMNS = ["หน่วยงาน", "เพศ"]
+UNKNOWN_GROUP = "ไม่ระบุ"
+
+RULE_NAMES = {
+    "fbs": "น้ำตาลในเลือด (FBS)",
+    "lipids": "ไขมันในเลือด",
+    "gfr": "การทำงานของไต (GFR)",
+    "liver": "การทำงานของตับ",
+    "bmi": "ดัชนีมวลกาย (BMI)",
+    "bp": "ความดันโลหิตสูง",
+}
+
+
+def _group_codes(df, col):
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=np.intp), [UNKNOWN_GROUP]
+    keys = df[col].astype(str).str.strip().replace({"": UNKNOWN_GROUP, "nan": UNKNOWN_GROUP})
+    codes, uniques = pd.factorize(keys)
+    return codes, uniques.tolist()
+
+
+class CohortCube:
+    def __init__(self, df, store):
+        (dept, depts), (sex, sexes) = (_group_codes(df, col) for col in GROUP_COLUMNS)
+        group = dept * len(sexes) + sex  # กลุ่มละเอียดสุดต่อแถว
+        size = len(depts) * len(sexes)
+        empty = np.full(len(df), np.nan)
+
+        def values(year):
+            def get(metric):
+                column = store.cohort(metric, year) if metric in store.metrics else empty
+                return column, ~np.isnan(column)
+            return get
+
+        parts = []
+        for year in store.years:
+            examined = np.bincount(group[store.has_results(year)], minlength=size)
+            for rule, (tested, abnormal) in prevalence_flags(values(year)).items():
+                parts.append(pd.DataFrame({
+                    "year": year,
+                    "group": np.arange(size),
+                    "rule": rule,
+                    "examined": examined,
+                    "tested": np.bincount(group[tested], minlength=size),
+                    "abnormal": np.bincount(group[abnormal], minlength=size),
+                }))
+        cube = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            columns=["year", "group", "rule", "examined", "tested", "abnormal"])
+        cube = cube[cube["examined"] > 0]
+        groups = cube.pop("group").to_numpy()
+        cube.insert(1, GROUP_COLUMNS[0], pd.Categorical.from_codes(groups // len(sexes), depts))
+        cube.insert(2, GROUP_COLUMNS[1], pd.Categorical.from_codes(groups % len(sexes), sexes))
+        cube["rule"] = pd.Categorical(cube["rule"], PREVALENCE_RULES)
+        self.cube = cube.reset_index(drop=True)
+        self.years = list(store.years)
+        self.departments = sorted(depts)
+        self.sexes = sorted(sexes)
+
+    def query(self, years=None, departments=None, sexes=None, by=()):
+        # รวม cube ตามตัวกรอง (None/ว่าง = ทั้งหมด) คืน (ข้อ, *by) -> examined, tested, abnormal, prevalence (%)
+        # รวมหลายปี examined คือจำนวนครั้งที่มาตรวจ (คนเดียวนับทุกปีที่มา)
+        cube = self.cube
+        mask = np.ones(len(cube), dtype=bool)
+        for col, chosen in (("year", years), (GROUP_COLUMNS[0], departments), (GROUP_COLUMNS[1], sexes)):
+            if chosen:
+                mask &= cube[col].isin(chosen).to_numpy()
+        keys = ["rule", *by]
+        out = cube[mask].groupby(keys, observed=True)[["examined", "tested", "abnormal"]].sum()
+        out["prevalence"] = out["abnormal"] / out["tested"].where(out["tested"] > 0) * 100
+        return out
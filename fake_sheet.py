@@ -0,0 +1,135 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from gspread.exceptions import GSpreadException
+from gspread.utils import a1_range_to_grid_range, numericise_all, to_records
+
+# ==================== FAKE GOOGLE SHEET ====================
+# ตัวแทน gspread ในเครื่อง ใช้ทดสอบ/benchmark แบบ offline
+# คืนค่าเป็นสตริง (FORMATTED_VALUE) และตัดเซลล์/แถวว่างท้ายช่วงแบบเดียวกับ Sheets API
+
+_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _trim(rows):
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] == "":
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.id = "fake-spreadsheet"
+        self.sheet1 = worksheet
+
+    def get_lastUpdateTime(self):
+        self.sheet1.calls["get_lastUpdateTime"] += 1
+        modified = _EPOCH + timedelta(seconds=self.sheet1.version)
+        return modified.isoformat().replace("+00:00", "Z")
+
+
+class FakeWorksheet:
+    def __init__(self, values, extra_rows=0):
+        self.values = [["" if v is None else str(v) for v in row] for row in values]
+        self.extra_rows = extra_rows  # แถวว่างท้ายกริดแบบชีตจริง
+        self.version = 0
+        self.calls = Counter()
+        self.cells_downloaded = 0
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        values = [list(map(str, df.columns))]
+        values += [["" if v is None else str(v) for v in row] for row in df.itertuples(index=False)]
+        return cls(values, **kwargs)
+
+    @property
+    def row_count(self):
+        return len(self.values) + self.extra_rows
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self.values), default=0)
+
+    def _touch(self):
+        self.version += 1
+
+    # ---------- read ----------
+    def _range(self, grid):
+        r0 = grid.get("startRowIndex", 0)
+        r1 = grid["endRowIndex"] if "endRowIndex" in grid else self.row_count
+        c0 = grid.get("startColumnIndex", 0)
+        c1 = grid["endColumnIndex"] if "endColumnIndex" in grid else self.col_count
+        rows = _trim(row[c0:c1] for row in self.values[r0:r1])
+        self.cells_downloaded += sum(len(row) for row in rows)
+        return rows
+
+    def get(self, range_name=None, pad_values=True, **kwargs):
+        self.calls["get"] += 1
+        grid = a1_range_to_grid_range(range_name) if range_name else {}
+        rows = self._range(grid)
+        if pad_values:
+            width = max((len(row) for row in rows), default=0)
+            rows = [row + [""] * (width - len(row)) for row in rows]
+        return rows or [[]]
+
+    def get_all_values(self, **kwargs):
+        return self.get(**kwargs)
+
+    def batch_get(self, ranges, **kwargs):
+        self.calls["batch_get"] += 1
+        return [self._range(a1_range_to_grid_range(name)) for name in ranges]
+
+    def get_all_records(self, **kwargs):
+        self.calls["get_all_records"] += 1
+        entire_sheet = self.get()
+        if entire_sheet == [[]]:
+            return []
+        keys, values = entire_sheet[0], entire_sheet[1:]
+        duplicates = [k for k, count in Counter(keys).items() if count > 1]
+        if duplicates:
+            raise GSpreadException(f"the header row in the worksheet contains duplicates: {duplicates}")
+        return to_records(keys, [numericise_all(row, False, "", False, []) for row in values])
+
+    # ---------- write (จำลองการแก้ชีตระหว่างรอบ sync) ----------
+    def append_row(self, values):
+        self.values.append([str(v) for v in values])
+        self._touch()
+
+    def insert_row(self, values, index=1):
+        self.values.insert(index - 1, [str(v) for v in values])
+        self._touch()
+
+    def update_cell(self, row, col, value):
+        cells = self.values[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = str(value)
+        self._touch()
+
+    def delete_rows(self, start_index, end_index=None):
+        del self.values[start_index - 1:(end_index or start_index)]
+        self._touch()
+
+    def add_column(self, header, values=()):
+        # เพิ่มคอลัมน์ท้ายชีต เช่น คอลัมน์ของปีใหม่
+        width = self.col_count
+        column = [header, *values]
+        for i, row in enumerate(self.values):
+            row.extend([""] * (width - len(row)))
+            row.append(str(column[i]) if i < len(column) else "")
+        self._touch()
+
+
+class FakeClient:
+    def __init__(self, worksheet):
+        self.spreadsheet = worksheet.spreadsheet
+
+    def open_by_url(self, url):
+        return self.spreadsheet
+
+    def open_by_key(self, key):
+        return self.spreadsheet
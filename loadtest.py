@@ -0,0 +1,174 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# ==================== LOAD TEST ====================
+# จำลองเจ้าหน้าที่ N คนใช้แอปพร้อมกัน: AppTest หนึ่งตัวต่อ session ในโปรเซสเดียวกัน (แชร์ cache_resource แบบ server จริง)
+# แต่ละ session: ค้นหาด้วยเลขบัตร/HN/ชื่อ -> เปลี่ยนปีหลายครั้ง -> อ่านรายงาน ข้อมูลจากชีตสังเคราะห์ใน FakeWorksheet
+# AppTest สลับ Runtime/st.secrets ระดับโปรเซสทุกครั้งที่ run จึงให้ rerun ผลัดกันทีละครั้ง (_RUN_LOCK)
+# latency = รอคิว + รันสคริปต์ ใกล้กับ server โปรเซสเดียวที่ rerun แย่ง GIL กันอยู่แล้ว
+#   python loadtest.py --sessions 1 2 4 8 --rows 2000 --out load.json --max-p95-ms 800
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+RSS_SAMPLE_INTERVAL = 0.05
+_RUN_LOCK = threading.Lock()
+
+# snapshot ของแต่ละรอบทดสอบอยู่ในโฟลเดอร์ชั่วคราว ไม่ทับไฟล์ของแอปจริง (ต้องตั้งก่อน import sheet)
+os.environ.setdefault("SHEET_SNAPSHOT_PATH", os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "sheet.arrow"))
+
+import sheet  # noqa: E402
+from bench import _meta  # noqa: E402
+from fake_sheet import FakeWorksheet  # noqa: E402
+from synthetic import generate  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+# AppTest ถูกเรียกจาก thread ของ session ไม่ใช่ thread สคริปต์ -> เตือน "missing ScriptRunContext" ทุกครั้ง
+# (ใช้ filter ไม่ใช่ setLevel เพราะ streamlit ตั้งระดับ log ของ logger ตัวเองใหม่ทุกครั้งที่โหลด config)
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: record.levelno >= logging.ERROR
+)
+
+
+class _RssSampler:
+    # RSS สูงสุดระหว่างรอบ (ru_maxrss เป็นค่าสูงสุดทั้งโปรเซส ใช้แยกรายรอบไม่ได้)
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, sheet._rss_bytes().get("VmRSS", 0))
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def _session(people, rng, switches, latencies, service, errors):
+    def rerun(action):
+        start = time.perf_counter()
+        with _RUN_LOCK:
+            begin = time.perf_counter()
+            action()
+            end = time.perf_counter()
+        latencies.append(end - start)
+        service.append(end - begin)
+        if at.exception:
+            errors.append(str(at.exception[0].message))
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.secrets["GCP_SERVICE_ACCOUNT"] = "{}"
+    rerun(at.run)
+
+    id_card, hn, name = people[rng.integers(len(people))]
+    field = rng.integers(3)  # ค้นด้วยช่องใดช่องหนึ่งแบบที่เจ้าหน้าที่ทำ
+    at.text_input[field].input((id_card, hn, name)[field])
+    rerun(at.button[0].click().run)
+    if not at.selectbox:
+        errors.append(f"ไม่พบรายงานของ {hn}")
+        return
+    options = at.selectbox[0].options
+    for _ in range(switches):
+        if not at.selectbox:
+            errors.append(f"ตัวเลือกปีหายหลัง rerun ({hn})")
+            return
+        year = int(str(options[rng.integers(len(options))]).split()[-1]) - 2500
+        rerun(at.selectbox[0].select(year).run)
+        if not at.markdown:
+            errors.append(f"รายงานว่าง {hn} ปี {year}")
+
+
+def run_level(people, sessions, switches, seed):
+    latencies, service, errors = [], [], []
+    threads = [
+        threading.Thread(
+            target=_session,
+            args=(people, np.random.default_rng(seed + i), switches, latencies, service, errors),
+        )
+        for i in range(sessions)
+    ]
+    with _RssSampler() as rss:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1e3
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]).tolist() if len(ms) else (np.nan,) * 3
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "seconds": elapsed,
+        "reruns_per_second": len(latencies) / elapsed,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": float(ms.max()) if len(ms) else np.nan,
+        "service_p50_ms": float(np.median(service)) * 1e3 if service else np.nan,
+        "peak_rss_mb": rss.peak / 1e6,
+        "errors": errors[:10],
+        "error_count": len(errors),
+    }
+
+
+def run(levels, rows=2000, switches=5, seed=0, progress=sys.stderr):
+    df = generate(rows, seed=seed)
+    worksheet = FakeWorksheet.from_frame(df)
+    people = list(zip(df["เลขบัตรประชาชน"], df["HN"], df["ชื่อ-สกุล"]))
+    sheet.open_worksheet = lambda service_account_info: worksheet
+
+    # warm-up: โหลดชีต/สร้าง index ครั้งแรกไม่นับในผล (เหมือน node ที่เปิดอยู่แล้ว)
+    run_level(people, 1, 1, seed)
+    results = []
+    for sessions in levels:
+        result = run_level(people, sessions, switches, seed)
+        results.append(result)
+        print(
+            f"{sessions} sessions: {result['reruns_per_second']:.1f} reruns/s "
+            f"p50 {result['p50_ms']:.0f} ms p95 {result['p95_ms']:.0f} ms p99 {result['p99_ms']:.0f} ms "
+            f"RSS {result['peak_rss_mb']:.0f} MB errors {result['error_count']}",
+            file=progress,
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="load test แอปรายงานสุขภาพหลาย session พร้อมกัน")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8], help="จำนวน session พร้อมกันแต่ละรอบ")
+    parser.add_argument("--rows", type=int, default=2000, help="จำนวนแถวของชีตสังเคราะห์")
+    parser.add_argument("--switches", type=int, default=5, help="จำนวนครั้งที่เปลี่ยนปีต่อ session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="เขียนผล JSON ลงไฟล์")
+    parser.add_argument("--max-p95-ms", type=float, help="p95 ของรอบใดเกินค่านี้ = exit 1 (ใช้เป็น gate)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sessions, rows=args.rows, switches=args.switches, seed=args.seed)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": _meta(), "rows": args.rows, "switches": args.switches, "levels": results}, f, ensure_ascii=False, indent=2)
+
+    failed = [r for r in results if r["error_count"]]
+    if args.max_p95_ms is not None:
+        failed += [r for r in results if r["p95_ms"] > args.max_p95_ms]
+    if failed:
+        sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import operator
+import re
+
+import numpy as np
+
+# ==================== REFERENCE RANGES ====================
+# ตารางเดียวของเกณฑ์ค่าอ้างอิง ใช้ทั้งช่องแดงในตารางผลตรวจและการแปลผล/คำแนะนำ (rules.py)
+# (ตัวชี้วัด, เพศ, ช่วง, ทิศทาง, ป้าย)  เพศ "" = ทุกเพศ  ป้าย None = ป้ายตามทิศทาง (LABELS)
+# ค่าที่ไม่ตกช่วงใดเลย = "low" ถ้าต่ำกว่าช่วง normal ไม่งั้น "high"
+REFERENCE_RANGES = [
+    # ---------- CBC ----------
+    ("hb", "ชาย", "x < 12", "very_low", "พบภาวะโลหิตจาง"),
+    ("hb", "ชาย", "12 <= x < 13", "low", "พบภาวะโลหิตจางเล็กน้อย"),
+    ("hb", "ชาย", "x >= 13", "normal", None),
+    ("hb", "หญิง", "x < 11", "very_low", "พบภาวะโลหิตจาง"),
+    ("hb", "หญิง", "11 <= x < 12", "low", "พบภาวะโลหิตจางเล็กน้อย"),
+    ("hb", "หญิง", "x >= 12", "normal", None),
+    ("hct", "ชาย", "x >= 39", "normal", None),
+    ("hct", "หญิง", "x >= 36", "normal", None),
+    ("wbc", "", "x <= 3000", "very_low", None),
+    ("wbc", "", "3000 < x < 4000", "low", None),
+    ("wbc", "", "4000 <= x <= 10000", "normal", None),
+    ("wbc", "", "10000 < x < 13000", "high", None),
+    ("wbc", "", "x >= 13000", "very_high", None),
+    ("ne", "", "43 <= x <= 70", "normal", None),
+    ("ly", "", "20 <= x <= 44", "normal", None),
+    ("mo", "", "3 <= x <= 9", "normal", None),
+    ("eo", "", "0 <= x <= 9", "normal", None),
+    ("ba", "", "0 <= x <= 3", "normal", None),
+    ("plt", "", "x < 100000", "very_low", None),
+    ("plt", "", "100000 <= x < 150000", "low", None),
+    ("plt", "", "150000 <= x <= 500000", "normal", None),
+    ("plt", "", "500000 < x < 600000", "high", None),
+    ("plt", "", "x >= 600000", "very_high", None),
+    # ---------- Blood ----------
+    ("FBS", "", "74 <= x < 100", "normal", None),
+    ("FBS", "", "100 <= x <= 106", "normal", "เริ่มสูงเล็กน้อย"),
+    ("FBS", "", "106 < x < 126", "high", "สูงเล็กน้อย"),
+    ("FBS", "", "x >= 126", "very_high", "สูง"),
+    ("Uric", "", "2.6 <= x <= 7.2", "normal", None),
+    ("ALK", "", "30 <= x <= 120", "normal", None),
+    ("SGOT", "", "x < 37", "normal", None),
+    ("SGPT", "", "x < 41", "normal", None),
+    ("Cholesterol", "", "150 <= x <= 200", "normal", None),
+    ("Cholesterol", "", "200 < x < 250", "high", None),
+    ("Cholesterol", "", "x >= 250", "very_high", None),
+    ("TG", "", "35 <= x <= 150", "normal", None),
+    ("TG", "", "150 < x < 250", "high", None),
+    ("TG", "", "x >= 250", "very_high", None),
+    ("HDL", "", "x >= 40", "normal", None),
+    ("LDL", "", "0 <= x <= 160", "normal", None),
+    ("LDL", "", "160 < x < 180", "high", None),
+    ("LDL", "", "x >= 180", "very_high", None),
+    ("BUN", "", "7.9 <= x <= 20", "normal", None),
+    ("Cr", "", "0.5 <= x <= 1.17", "normal", None),
+    ("GFR", "", "x >= 60", "normal", None),
+    # ---------- Urine ----------
+    ("urine_ph", "", "5.0 <= x <= 8.0", "normal", None),
+    ("urine_spgr", "", "1.003 <= x <= 1.030", "normal", None),
+    ("urine_rbc", "", "0 <= x <= 2", "normal", None),
+    ("urine_wbc", "", "0 <= x <= 5", "normal", None),
+    ("urine_sq_epi", "", "0 <= x <= 10", "normal", None),
+]
+
+# ผลปัสสาวะแบบข้อความ: ค่าที่ถือว่าปกติ (ตัวพิมพ์เล็ก)
+NORMAL_VALUES = {
+    "urine_color": {"yellow", "pale yellow"},
+    "urine_sugar": {"negative"},
+    "urine_alb": {"negative", "trace"},
+}
+
+# ข้อความช่อง "ค่าปกติ" ในตารางผลตรวจ
+NORMAL_TEXT = {
+    "hb": "ชาย > 13, หญิง > 12 g/dl",
+    "hct": "ชาย > 39%, หญิง > 36%",
+    "wbc": "4,000 - 10,000 /cu.mm",
+    "ne": "43 - 70%",
+    "ly": "20 - 44%",
+    "mo": "3 - 9%",
+    "eo": "0 - 9%",
+    "ba": "0 - 3%",
+    "plt": "150,000 - 500,000 /cu.mm",
+    "FBS": "74 - 106 mg/dl",
+    "Uric": "2.6 - 7.2 mg%",
+    "ALK": "30 - 120 U/L",
+    "SGOT": "&lt; 37 U/L",
+    "SGPT": "&lt; 41 U/L",
+    "Cholesterol": "150 - 200 mg/dl",
+    "TG": "35 - 150 mg/dl",
+    "HDL": "&gt; 40 mg/dl",
+    "LDL": "0 - 160 mg/dl",
+    "BUN": "7.9 - 20 mg/dl",
+    "Cr": "0.5 - 1.17 mg/dl",
+    "GFR": "&gt; 60 mL/min",
+    "urine_color": "Yellow, Pale Yellow",
+    "urine_sugar": "Negative",
+    "urine_alb": "Negative, trace",
+    "urine_ph": "5.0 - 8.0",
+    "urine_spgr": "1.003 - 1.030",
+    "urine_rbc": "0 - 2 cell/HPF",
+    "urine_wbc": "0 - 5 cell/HPF",
+    "urine_sq_epi": "0 - 10 cell/HPF",
+    "urine_other": "-",
+}
+
+LABELS = {
+    "very_low": "ต่ำกว่าเกณฑ์",
+    "low": "ต่ำกว่าเกณฑ์เล็กน้อย",
+    "normal": "ปกติ",
+    "high": "สูงกว่าเกณฑ์เล็กน้อย",
+    "very_high": "สูงกว่าเกณฑ์",
+}
+HIGH = ("high", "very_high")
+LOW = ("very_low", "low")
+
+# เพศไม่ระบุใช้เกณฑ์ผู้ชาย (แบบตารางผลตรวจเดิม)
+DEFAULT_SEX = "ชาย"
+
+# ==================== COMPILE ====================
+# แปลงข้อความช่วงครั้งเดียวตอน import -> (ตัวเปรียบเทียบ, ขอบ) ตอนประเมินไม่ต้อง parse อีก
+_NUMBER = r"-?\d+(?:\.\d+)?"
+_RANGE = re.compile(rf"^(?:({_NUMBER})\s*(<=|<)\s*)?x(?:\s*(<=|<|>=|>)\s*({_NUMBER}))?$")
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+_FLIP = {"<": ">", "<=": ">="}
+
+
+def _parse_range(text):
+    # "a <= x < b" -> (op, a, op, b) เช่น (ge, a, lt, b) ขอบที่ไม่มี = อนันต์
+    match = _RANGE.match(text.strip())
+    if not match:
+        raise ValueError(f"รูปแบบช่วงไม่ถูกต้อง: {text!r}")
+    low, low_op, op, bound = match.groups()
+    low_test = (_OPS[_FLIP[low_op]], float(low)) if low else (operator.ge, -np.inf)
+    high_test = (operator.le, np.inf)
+    if op in ("<", "<="):
+        high_test = (_OPS[op], float(bound))
+    elif op in (">", ">="):
+        if low:
+            raise ValueError(f"รูปแบบช่วงไม่ถูกต้อง: {text!r}")
+        low_test = (_OPS[op], float(bound))
+    return low_test + high_test
+
+
+class ReferenceRange:
+    # เกณฑ์ของตัวชี้วัดหนึ่ง (เพศหนึ่ง) ใช้ได้ทั้งค่าเดียวและทั้งคอลัมน์ (numpy)
+    def __init__(self, analyte, sex, rows):
+        self.analyte = analyte
+        self.sex = sex
+        self._tests = [_parse_range(text) for text, _, _ in rows]
+        normal = [low for (_, low, _, _), (_, direction, _) in zip(self._tests, rows) if direction == "normal"]
+        if not normal:
+            raise ValueError(f"{analyte} ({sex or 'ทุกเพศ'}) ไม่มีช่วง normal")
+        self.normal_low = min(normal)
+        # ตำแหน่งช่วง -> ทิศทาง/ป้าย สองช่องท้าย = ต่ำกว่า/สูงกว่าทุกช่วง
+        self.directions = [direction for _, direction, _ in rows] + ["low", "high"]
+        self.labels = [label or LABELS[direction] for _, direction, label in rows] + [LABELS["low"], LABELS["high"]]
+        self._directions = np.array(self.directions, dtype=object)
+        self._labels = np.array(self.labels, dtype=object)
+
+    def position(self, value):
+        for i, (low_op, low, high_op, high) in enumerate(self._tests):
+            if low_op(value, low) and high_op(value, high):
+                return i
+        return len(self._tests) if value < self.normal_low else len(self._tests) + 1
+
+    def direction(self, value):
+        return self.directions[self.position(value)]
+
+    def label(self, value):
+        return self.labels[self.position(value)]
+
+    def is_abnormal(self, value):
+        return self.direction(value) != "normal"
+
+    # ---------- ทั้งคอลัมน์ ----------
+    def positions(self, values):
+        values = np.asarray(values, dtype=float)
+        below = len(self._tests)
+        with np.errstate(invalid="ignore"):
+            out = np.where(values < self.normal_low, below, below + 1)
+            for i, (low_op, low, high_op, high) in enumerate(self._tests):
+                out[low_op(values, low) & high_op(values, high)] = i
+        return out
+
+    def directions_of(self, values):
+        return self._directions[self.positions(values)]
+
+    def labels_of(self, values):
+        return self._labels[self.positions(values)]
+
+    def lookup(self, values, choices, default=""):
+        # ป้าย -> ค่าอื่น เช่น ป้าย FBS -> คำแนะนำ (สร้างตารางตามตำแหน่งช่วงครั้งเดียวแล้ว index)
+        table = np.array([choices.get(label, default) for label in self.labels], dtype=object)
+        return table[self.positions(values)]
+
+
+def compile_ranges(table):
+    grouped = {}
+    for analyte, sex, text, direction, label in table:
+        if direction not in LABELS:
+            raise ValueError(f"{analyte}: ทิศทางไม่รู้จัก {direction!r}")
+        grouped.setdefault((analyte, sex), []).append((text, direction, label))
+    return {key: ReferenceRange(*key, rows) for key, rows in grouped.items()}
+
+
+RANGES = compile_ranges(REFERENCE_RANGES)
+
+
+def reference(analyte, sex=""):
+    # เกณฑ์ตามเพศถ้ามี ไม่งั้นเกณฑ์ทุกเพศ แล้วค่อยเกณฑ์เพศเริ่มต้น
+    return RANGES.get((analyte, sex)) or RANGES.get((analyte, "")) or RANGES[(analyte, DEFAULT_SEX)]
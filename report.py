@@ -0,0 +1,1018 @@
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+
+from ranges import NORMAL_TEXT, NORMAL_VALUES, RANGES, reference
+from rules import (
+    interpret_bp,
+    interpret_hb,
+    interpret_plt,
+    summarize_liver,
+    uric_acid_advice,
+    kidney_summary_gfr_only,
+    fbs_advice,
+    summarize_lipids,
+    to_float,
+)
+from rules import interpret_wbc as interpret_cbc_wbc
+from sheet import display_value
+from timing import timed
+
+# ==================== STYLE ====================
+REPORT_STYLE = """
+<style>
+    .doctor-section {
+        font-size: 16px;
+        line-height: 1.8;
+        margin-top: 2rem;
+    }
+
+    .summary-box {
+        background-color: #dcedc8;
+        padding: 12px 18px;
+        font-weight: bold;
+        border-radius: 6px;
+        margin-bottom: 1.5rem;
+    }
+
+    .appointment-box {
+        background-color: #ffcdd2;
+        padding: 12px 18px;
+        border-radius: 6px;
+        margin-bottom: 1.5rem;
+    }
+
+    .remark {
+        font-weight: bold;
+        margin-top: 2rem;
+    }
+
+    .footer {
+        display: flex;
+        justify-content: space-between;
+        margin-top: 3rem;
+        font-size: 16px;
+    }
+
+    .footer .right {
+        text-align: right;
+    }
+
+    .section-header {
+        background-color: #1B5E20;
+        padding: 20px 24px;
+        border-radius: 6px;
+        font-size: 18px;
+        font-weight: bold;
+        color: white;
+        text-align: center;
+        line-height: 1.4;
+        margin: 2rem 0 1rem 0;
+    }
+
+    .styled-wrapper {
+        max-width: 820px;
+        margin: 0 auto;
+    }
+    .styled-result {
+        width: 100%;
+        border-collapse: collapse;
+    }
+    .styled-result th {
+        background-color: #111;
+        color: white;
+        padding: 6px 12px;
+        text-align: center;
+    }
+    .styled-result td {
+        padding: 6px 12px;
+        vertical-align: middle;
+    }
+    .styled-result td:nth-child(2) {
+        text-align: center;
+    }
+    .abn {
+        background-color: rgba(255, 0, 0, 0.15);
+    }
+
+    .result-box {
+        font-size: 16px;
+        padding: 1rem;
+        border-radius: 6px;
+        margin-bottom: 1.5rem;
+    }
+
+    .advice-box {
+        background-color: rgba(255, 215, 0, 0.2);
+        padding: 1rem;
+        border-radius: 6px;
+        font-size: 16px;
+    }
+</style>
+"""
+
+FONT_STYLE = """
+    <style>
+    @import url('https://fonts.googleapis.com/css2?family=Chakra+Petch&display=swap');
+    html, body, [class*="css"] {
+        font-family: 'Chakra Petch', sans-serif !important;
+    }
+    </style>
+"""
+
+
+# ==================== INTERPRET FUNCTIONS ====================
+def combined_health_advice(bmi, sbp, dbp):
+    try:
+        bmi = float(bmi)
+    except (TypeError, ValueError):
+        bmi = None
+    try:
+        sbp = float(sbp)
+        dbp = float(dbp)
+    except (TypeError, ValueError):
+        sbp = dbp = None
+
+    # วิเคราะห์ BMI
+    if bmi is None:
+        bmi_text = ""
+    elif bmi > 30:
+        bmi_text = "น้ำหนักเกินมาตรฐานมาก"
+    elif bmi >= 25:
+        bmi_text = "น้ำหนักเกินมาตรฐาน"
+    elif bmi < 18.5:
+        bmi_text = "น้ำหนักน้อยกว่ามาตรฐาน"
+    else:
+        bmi_text = "น้ำหนักอยู่ในเกณฑ์ปกติ"
+
+    # วิเคราะห์ความดัน
+    if sbp is None or dbp is None:
+        bp_text = ""
+    elif sbp >= 160 or dbp >= 100:
+        bp_text = "ความดันโลหิตอยู่ในระดับสูงมาก"
+    elif sbp >= 140 or dbp >= 90:
+        bp_text = "ความดันโลหิตอยู่ในระดับสูง"
+    elif sbp >= 120 or dbp >= 80:
+        bp_text = "ความดันโลหิตเริ่มสูง"
+    else:
+        bp_text = ""  # ❗ ถ้าปกติ = ไม่ต้องพูดถึง
+
+    # สร้างคำแนะนำรวม
+    if not bmi_text and not bp_text:
+        return "ไม่พบข้อมูลเพียงพอในการประเมินสุขภาพ"
+
+    if "ปกติ" in bmi_text and not bp_text:
+        return "น้ำหนักอยู่ในเกณฑ์ดี ควรรักษาพฤติกรรมสุขภาพนี้ต่อไป"
+
+    if not bmi_text and bp_text:
+        return f"{bp_text} แนะนำให้ดูแลสุขภาพ และติดตามค่าความดันอย่างสม่ำเสมอ"
+
+    if bmi_text and bp_text:
+        return f"{bmi_text} และ {bp_text} แนะนำให้ปรับพฤติกรรมด้านอาหารและการออกกำลังกาย"
+
+    return f"{bmi_text} แนะนำให้ดูแลเรื่องโภชนาการและการออกกำลังกายอย่างเหมาะสม"
+
+
+def interpret_alb(value):
+    value = str(value).strip().lower()
+    if value == "negative":
+        return "ไม่พบ"
+    elif value in ["trace", "1+", "2+"]:
+        return "พบโปรตีนในปัสสาวะเล็กน้อย"
+    elif value == "3+":
+        return "พบโปรตีนในปัสสาวะ"
+    return "-"
+
+
+def interpret_sugar(value):
+    value = str(value).strip().lower()
+    if value == "negative":
+        return "ไม่พบ"
+    elif value == "trace":
+        return "พบน้ำตาลในปัสสาวะเล็กน้อย"
+    elif value in ["1+", "2+", "3+", "4+", "5+", "6+"]:
+        return "พบน้ำตาลในปัสสาวะ"
+    return "-"
+
+
+def interpret_rbc(value):
+    value = str(value).strip().lower()
+    if value in ["0-1", "negative", "1-2", "2-3", "3-5"]:
+        return "ปกติ"
+    elif value in ["5-10", "10-20"]:
+        return "พบเม็ดเลือดแดงในปัสสาวะเล็กน้อย"
+    return "พบเม็ดเลือดแดงในปัสสาวะ"
+
+
+def interpret_wbc(value):
+    value = str(value).strip().lower()
+    if value in ["0-1", "negative", "1-2", "2-3", "3-5"]:
+        return "ปกติ"
+    elif value in ["5-10", "10-20"]:
+        return "พบเม็ดเลือดขาวในปัสสาวะเล็กน้อย"
+    return "พบเม็ดเลือดขาวในปัสสาวะ"
+
+
+def advice_urine(sex, alb, sugar, rbc, wbc):
+    alb_text = interpret_alb(alb)
+    sugar_text = interpret_sugar(sugar)
+    rbc_text = interpret_rbc(rbc)
+    wbc_text = interpret_wbc(wbc)
+
+    if all(x in ["-", "ปกติ", "ไม่พบ", "พบโปรตีนในปัสสาวะเล็กน้อย", "พบน้ำตาลในปัสสาวะเล็กน้อย"]
+           for x in [alb_text, sugar_text, rbc_text, wbc_text]):
+        return ""
+
+    if "พบน้ำตาลในปัสสาวะ" in sugar_text and "เล็กน้อย" not in sugar_text:
+        return "ควรลดการบริโภคน้ำตาล และตรวจระดับน้ำตาลในเลือดเพิ่มเติม"
+
+    if sex == "หญิง" and "พบเม็ดเลือดแดง" in rbc_text and "ปกติ" in wbc_text:
+        return "อาจมีปนเปื้อนจากประจำเดือน แนะนำให้ตรวจซ้ำ"
+
+    if sex == "ชาย" and "พบเม็ดเลือดแดง" in rbc_text and "ปกติ" in wbc_text:
+        return "พบเม็ดเลือดแดงในปัสสาวะ ควรตรวจทางเดินปัสสาวะเพิ่มเติม"
+
+    if "พบเม็ดเลือดขาวในปัสสาวะ" in wbc_text and "เล็กน้อย" not in wbc_text:
+        return "อาจมีการอักเสบของระบบทางเดินปัสสาวะ แนะนำให้ตรวจซ้ำ"
+
+    return "ควรตรวจปัสสาวะซ้ำเพื่อติดตามผล"
+
+
+def interpret_stool_exam(value):
+    if not value or value.strip() == "":
+        return "-"
+    if "ปกติ" in value:
+        return "ปกติ"
+    elif "เม็ดเลือดแดง" in value:
+        return "พบเม็ดเลือดแดงในอุจจาระ นัดตรวจซ้ำ"
+    elif "เม็ดเลือดขาว" in value:
+        return "พบเม็ดเลือดขาวในอุจจาระ นัดตรวจซ้ำ"
+    return value.strip()
+
+
+def interpret_stool_cs(value):
+    if not value or value.strip() == "":
+        return "-"
+    if "ไม่พบ" in value or "ปกติ" in value:
+        return "ไม่พบการติดเชื้อ"
+    return "พบการติดเชื้อในอุจจาระ ให้พบแพทย์เพื่อตรวจรักษาเพิ่มเติม"
+
+
+# ==================== RENDER HELPERS ====================
+def flag_value(raw, metric, sex=""):
+    val = to_float(raw, strip_commas=True)
+    if val is None:
+        return "-", False
+    return f"{val:.1f}", reference(metric, sex).is_abnormal(val)
+
+
+# ==================== TEMPLATES ====================
+# ชิ้น HTML คงที่สร้างครั้งเดียวตอน import CSS อยู่ใน REPORT_STYLE (ส่งครั้งเดียวต่อหน้า)
+_TABLE_OPEN = "<div class='styled-wrapper'><table class='styled-result'><thead><tr>"
+_TABLE_BODY = "</tr></thead><tbody>"
+_TABLE_CLOSE = "</tbody></table></div>"
+_SECTION_HEADER_OPEN = "<div class='section-header'>"
+
+# ส่วนลงชื่อแพทย์ (ข้อความคงที่)
+_DOCTOR_BLOCK = """
+    <div style='
+        background-color: #1B5E20;
+        padding: 20px 24px;
+        border-radius: 6px;
+        font-size: 18px;
+        line-height: 1.6;
+        margin: 1.5rem 0;
+        color: inherit;
+    '>
+        <b>สรุปความเห็นของแพทย์ :</b> (ยังไม่ได้เชื่อมคอลัมน์)
+    </div>
+
+    <div style='
+        margin-top: 3rem;
+        text-align: right;
+        padding-right: 1rem;
+    '>
+        <div style='
+            display: inline-block;
+            text-align: center;
+            width: 340px;
+        '>
+            <div style='
+                border-bottom: 1px dotted #ccc;
+                margin-bottom: 0.5rem;
+                width: 100%;
+            '></div>
+            <div style='white-space: nowrap;'>นายแพทย์นพรัตน์ รัชฎาพร</div>
+            <div style='white-space: nowrap;'>เลขที่ใบอนุญาตผู้ประกอบวิชาชีพเวชกรรม ว.26674</div>
+        </div>
+    </div>
+    """
+
+
+def styled_result_table(headers, rows):
+    # ต่อทุกชิ้นใน list เดียวแล้ว join ครั้งเดียว
+    parts = [_TABLE_OPEN]
+    parts += [f"<th>{h}</th>" for h in headers]
+    parts.append(_TABLE_BODY)
+    for row in rows:
+        parts.append("<tr>")
+        parts += [f"<td class='abn'>{cell}</td>" if is_abn else f"<td>{cell}</td>" for cell, is_abn in row]
+        parts.append("</tr>")
+    parts.append(_TABLE_CLOSE)
+    return "".join(parts)
+
+
+def flag_urine_value(val, metric):
+    val_str = str(val).strip()
+    if val_str.upper() in ["N/A", "-", ""]:
+        return "-", False
+
+    if metric in NORMAL_VALUES:
+        return val_str, val_str.lower() not in NORMAL_VALUES[metric]
+    if (metric, "") in RANGES:
+        try:
+            # ค่าแบบช่วง เช่น "2-3" cell/HPF ใช้ค่าบน
+            num = float(val_str.split("-")[-1])
+        except ValueError:
+            return val_str, True
+        return val_str, reference(metric).is_abnormal(num)
+
+    return val_str, False
+
+
+def render_section_header(title):
+    return f"{_SECTION_HEADER_OPEN}{title}</div>"
+
+
+def merge_similar_sentences(messages):
+    if len(messages) == 1:
+        return messages[0]
+
+    merged = []
+    seen_prefixes = {}
+
+    for msg in messages:
+        prefix = re.match(r"^(ควรพบแพทย์เพื่อตรวจหา(?:และติดตาม)?(?:[^,]*)?)", msg)
+        if prefix:
+            key = "ควรพบแพทย์เพื่อตรวจหา"
+            rest = msg[len(prefix.group(1)):].strip()
+            phrase = prefix.group(1)[len(key):].strip()
+
+            # 🔧 รวม phrase และ rest → แล้วลบ "และ" ที่ขึ้นต้น
+            full_detail = f"{phrase} {rest}".strip()
+            full_detail = re.sub(r"^และ\s+", "", full_detail)
+
+            if key in seen_prefixes:
+                seen_prefixes[key].append(full_detail)
+            else:
+                seen_prefixes[key] = [full_detail]
+        else:
+            merged.append(msg)
+
+    for key, endings in seen_prefixes.items():
+        endings = [e.strip() for e in endings if e]
+        if endings:
+            if len(endings) == 1:
+                merged.append(f"{key} {endings[0]}")
+            else:
+                body = " ".join(endings[:-1]) + " และ " + endings[-1]
+                merged.append(f"{key} {body}")
+        else:
+            merged.append(key)
+
+    return "<br>".join(merged)
+
+
+cbc_messages = {
+    2:  "ดูแลสุขภาพ ออกกำลังกาย ทานอาหารมีประโยชน์ ติดตามผลเลือดสม่ำเสมอ",
+    4:  "ควรพบแพทย์เพื่อตรวจหาสาเหตุเกล็ดเลือดต่ำ เพื่อเฝ้าระวังอาการผิดปกติ",
+    6:  "ควรตรวจซ้ำเพื่อติดตามเม็ดเลือดขาว และดูแลสุขภาพร่างกายให้แข็งแรง",
+    8:  "ควรพบแพทย์เพื่อตรวจหาสาเหตุภาวะโลหิตจาง เพื่อรักษาตามนัด",
+    9:  "ควรพบแพทย์เพื่อตรวจหาและติดตามภาวะโลหิตจางร่วมกับเม็ดเลือดขาวผิดปกติ",
+    10: "ควรพบแพทย์เพื่อตรวจหาสาเหตุเกล็ดเลือดสูง เพื่อพิจารณาการรักษา",
+    13: "ควรดูแลสุขภาพ ติดตามภาวะโลหิตจางและเม็ดเลือดขาวผิดปกติอย่างใกล้ชิด",
+}
+
+
+def cbc_advice(hb_result, wbc_result, plt_result):
+    message_ids = []
+
+    if all(x in ["", "-", None] for x in [hb_result, wbc_result, plt_result]):
+        return "-"
+
+    if hb_result == "พบภาวะโลหิตจาง":
+        if wbc_result == "ปกติ" and plt_result == "ปกติ":
+            message_ids.append(8)
+        elif wbc_result in ["ต่ำกว่าเกณฑ์", "ต่ำกว่าเกณฑ์เล็กน้อย", "สูงกว่าเกณฑ์เล็กน้อย", "สูงกว่าเกณฑ์"]:
+            message_ids.append(9)
+    elif hb_result == "พบภาวะโลหิตจางเล็กน้อย":
+        if wbc_result == "ปกติ" and plt_result == "ปกติ":
+            message_ids.append(2)
+        elif wbc_result in ["ต่ำกว่าเกณฑ์", "ต่ำกว่าเกณฑ์เล็กน้อย", "สูงกว่าเกณฑ์เล็กน้อย", "สูงกว่าเกณฑ์"]:
+            message_ids.append(13)
+
+    if wbc_result in ["ต่ำกว่าเกณฑ์", "ต่ำกว่าเกณฑ์เล็กน้อย", "สูงกว่าเกณฑ์เล็กน้อย", "สูงกว่าเกณฑ์"] and hb_result == "ปกติ":
+        message_ids.append(6)
+
+    if plt_result == "สูงกว่าเกณฑ์":
+        message_ids.append(10)
+    elif plt_result in ["ต่ำกว่าเกณฑ์", "ต่ำกว่าเกณฑ์เล็กน้อย"]:
+        message_ids.append(4)
+
+    if not message_ids and hb_result == "ปกติ" and wbc_result == "ปกติ" and plt_result == "ปกติ":
+        return ""
+
+    if not message_ids:
+        return "ควรพบแพทย์เพื่อตรวจเพิ่มเติม"
+
+    # รวมข้อความจากหลาย id
+    raw_msgs = [cbc_messages[i] for i in sorted(set(message_ids))]
+    return merge_similar_sentences(raw_msgs)
+
+
+def liver_advice(summary_text):
+    if summary_text == "การทำงานของตับสูงกว่าเกณฑ์ปกติเล็กน้อย":
+        return "ควรลดอาหารไขมันสูงและตรวจติดตามการทำงานของตับซ้ำ"
+    elif summary_text == "ปกติ":
+        return ""
+    return "-"
+
+
+def kidney_advice_from_summary(summary_text):
+    if summary_text == "การทำงานของไตต่ำกว่าเกณฑ์ปกติเล็กน้อย":
+        return (
+            "การทำงานของไตต่ำกว่าเกณฑ์ปกติเล็กน้อย "
+            "ลดอาหารเค็ม อาหารโปรตีนสูงย่อยยาก ดื่มน้ำ 8-10 แก้วต่อวัน "
+            "และไม่ควรกลั้นปัสสาวะ มีอาการบวมผิดปกติให้พบแพทย์"
+        )
+    return ""
+
+
+def lipids_advice(summary_text):
+    if summary_text == "ไขมันในเลือดสูง":
+        return (
+            "ไขมันในเลือดสูง ควรลดอาหารที่มีไขมันอิ่มตัว เช่น ของทอด หนังสัตว์ "
+            "ออกกำลังกายสม่ำเสมอ และพิจารณาพบแพทย์เพื่อตรวจติดตาม"
+        )
+    elif summary_text == "ไขมันในเลือดสูงเล็กน้อย":
+        return (
+            "ไขมันในเลือดสูงเล็กน้อย ควรปรับพฤติกรรมการบริโภค ลดของมัน "
+            "และออกกำลังกายเพื่อควบคุมระดับไขมัน"
+        )
+    return ""
+
+
+def merge_final_advice_grouped(messages):
+    groups = {
+        "FBS": [],
+        "ไต": [],
+        "ตับ": [],
+        "ยูริค": [],
+        "ไขมัน": [],
+        "CBC": [],
+    }
+
+    for msg in messages:
+        if "น้ำตาล" in msg:
+            groups["FBS"].append(msg)
+        elif "ไต" in msg:
+            groups["ไต"].append(msg)
+        elif "ตับ" in msg:
+            groups["ตับ"].append(msg)
+        elif "ยูริค" in msg or "พิวรีน" in msg:
+            groups["ยูริค"].append(msg)
+        elif "ไขมัน" in msg:
+            groups["ไขมัน"].append(msg)
+        else:
+            groups["CBC"].append(msg)
+
+    section_texts = []
+    for title, msgs in groups.items():
+        if msgs:
+            icon = {
+                "FBS": "🍬", "ไต": "💧", "ตับ": "🫀",
+                "ยูริค": "🦴", "ไขมัน": "🧈", "CBC": "🩸"
+            }.get(title, "📝")
+            merged_msgs = [m for m in msgs if m.strip() != "-"]
+            if not merged_msgs:
+                continue  # ข้ามหมวดนี้ไปเลย
+            merged = " ".join(OrderedDict.fromkeys(merged_msgs))
+            section = f"<b>{icon} {title}:</b> {merged}"
+            section_texts.append(section)
+
+    if not section_texts:
+        return "ไม่พบคำแนะนำเพิ่มเติมจากผลตรวจ"
+
+    return "<div style='margin-bottom: 0.75rem;'>" + "</div><div style='margin-bottom: 0.75rem;'>".join(section_texts) + "</div>"
+
+
+def interpret_cxr(value):
+    if not value or str(value).strip() == "":
+        return "-"
+    return str(value).strip()
+
+
+def interpret_ekg(value):
+    if not value or str(value).strip() == "":
+        return "-"
+    return str(value).strip()
+
+
+def interpret_hep(value):
+    if not value or str(value).strip() == "":
+        return "-"
+    return str(value).strip()
+
+
+def hepatitis_b_advice(hbsag, hbsab, hbcab):
+    hbsag = hbsag.lower()
+    hbsab = hbsab.lower()
+    hbcab = hbcab.lower()
+
+    if "positive" in hbsag:
+        return "ติดเชื้อไวรัสตับอักเสบบี"
+    elif "positive" in hbsab and "positive" not in hbsag:
+        return "มีภูมิคุ้มกันต่อไวรัสตับอักเสบบี"
+    elif "positive" in hbcab and "positive" not in hbsab:
+        return "เคยติดเชื้อแต่ไม่มีภูมิคุ้มกันในปัจจุบัน"
+    elif all(x == "negative" for x in [hbsag, hbsab, hbcab]):
+        return "ไม่มีภูมิคุ้มกันต่อไวรัสตับอักเสบบี"
+    else:
+        return "ไม่สามารถสรุปผลชัดเจน แนะนำให้พบแพทย์เพื่อประเมินซ้ำ"
+
+
+# ==================== REPORT ====================
+class Report:
+    # บล็อกเรียงจากบนลงล่าง: (สัดส่วนคอลัมน์แบบ st.columns รวม spacer ซ้ายขวา หรือ None = เต็มความกว้าง,
+    # [รายการ HTML ของแต่ละคอลัมน์]) แอปแสดงด้วย st.columns ส่วน batch เขียนเป็นไฟล์ HTML
+    def __init__(self):
+        self.warnings = []
+        self.blocks = []
+
+    def row(self, spec=None):
+        columns = [[] for _ in range(len(spec) - 2 if spec else 1)]
+        self.blocks.append((spec, columns))
+        return columns
+
+
+@timed("values")
+def year_values(store, row, year):
+    # {ตัวชี้วัด: ค่า} ของปีนั้นในรูปแบบเดียวกับค่าเซลล์ของชีต (display_value ว่าง = "")
+    return {metric: display_value(store.value(row, metric, year)) for metric in store.columns(year)}
+
+
+@timed("report")
+def build_report(person, values, year):
+    # person = sheet.PersonRecord, values = year_values(...) ของปีที่เลือก
+    selected_year = year
+    report = Report()
+
+    def lab_value(metric, default=""):
+        return values.get(metric, default)
+
+    def render_health_report(person):
+        sbp = lab_value("sbp")
+        dbp = lab_value("dbp")
+        pulse = lab_value("pulse", "-")
+        weight = lab_value("weight", "-")
+        height = lab_value("height", "-")
+        waist = lab_value("waist", "-")
+
+        bp_result = "-"
+        if sbp and dbp:
+            bp_val = f"{sbp}/{dbp} ม.ม.ปรอท"
+            bp_desc = interpret_bp(sbp, dbp)
+            bp_result = f"{bp_val} - {bp_desc}"
+
+        pulse = f"{pulse} ครั้ง/นาที" if pulse != "-" else "-"
+        weight = f"{weight} กก." if weight else "-"
+        height = f"{height} ซม." if height else "-"
+        waist = f"{waist} ซม." if waist else "-"
+
+        try:
+            weight_val = float(weight.replace(" กก.", "").strip())
+            height_val = float(height.replace(" ซม.", "").strip())
+            bmi_val = weight_val / ((height_val / 100) ** 2)
+        except Exception as e:
+            report.warnings.append(f"❌ ไม่สามารถคำนวณ BMI ได้: {e}")
+            bmi_val = None
+
+        summary_advice = html.escape(combined_health_advice(bmi_val, sbp, dbp))
+
+        return f"""
+        <div style="font-size: 18px; line-height: 1.8; color: inherit; padding: 24px 8px;">
+            <div style="text-align: center; font-size: 22px; font-weight: bold;">รายงานผลการตรวจสุขภาพ</div>
+            <div style="text-align: center;">วันที่ตรวจ: {person.exam_date}</div>
+            <div style="text-align: center; margin-top: 10px;">
+                โรงพยาบาลสันทราย 201 หมู่ที่ 11 ถนน เชียงใหม่ - พร้าว<br>
+                ตำบลหนองหาร อำเภอสันทราย เชียงใหม่ 50290 โทร 053 921 199 ต่อ 167
+            </div>
+            <hr style="margin: 24px 0;">
+            <div style="display: flex; flex-wrap: wrap; justify-content: center; gap: 32px; margin-bottom: 20px; text-align: center;">
+                <div><b>ชื่อ-สกุล:</b> {person.name}</div>
+                <div><b>อายุ:</b> {person.age} ปี</div>
+                <div><b>เพศ:</b> {person.sex}</div>
+                <div><b>HN:</b> {person.hn}</div>
+                <div><b>หน่วยงาน:</b> {person.department}</div>
+            </div>
+            <div style="display: flex; flex-wrap: wrap; justify-content: center; gap: 32px; margin-bottom: 16px; text-align: center;">
+                <div><b>น้ำหนัก:</b> {weight}</div>
+                <div><b>ส่วนสูง:</b> {height}</div>
+                <div><b>รอบเอว:</b> {waist}</div>
+                <div><b>ความดันโลหิต:</b> {bp_result}</div>
+                <div><b>ชีพจร:</b> {pulse}</div>
+            </div>
+            <div style="margin-top: 16px; text-align: center;">
+                <b>คำแนะนำ:</b> {summary_advice}
+            </div>
+        </div>
+        """
+
+    header, = report.row()
+    header.append(render_health_report(person))
+
+    # ================== CBC / BLOOD TEST DISPLAY ==================
+
+    # ✅ CBC config (เกณฑ์/ข้อความค่าปกติอยู่ใน ranges.py)
+    sex = person.sex
+
+    cbc_config = [
+        ("ฮีโมโกลบิน (Hb)", "hb"),
+        ("ฮีมาโทคริต (Hct)", "hct"),
+        ("เม็ดเลือดขาว (wbc)", "wbc"),
+        ("นิวโทรฟิล (Neutrophil)", "ne"),
+        ("ลิมโฟไซต์ (Lymphocyte)", "ly"),
+        ("โมโนไซต์ (Monocyte)", "mo"),
+        ("อีโอซิโนฟิล (Eosinophil)", "eo"),
+        ("เบโซฟิล (Basophil)", "ba"),
+        ("เกล็ดเลือด (Platelet)", "plt"),
+    ]
+
+    # ✅ BLOOD config
+    blood_config = [
+        ("น้ำตาลในเลือด (FBS)", "FBS"),
+        ("กรดยูริคสาเหตุโรคเก๊าท์ (Uric acid)", "Uric"),
+        ("การทำงานของเอนไซม์ตับ ALK.POS", "ALK"),
+        ("การทำงานของเอนไซม์ตับ SGOT", "SGOT"),
+        ("การทำงานของเอนไซม์ตับ SGPT", "SGPT"),
+        ("คลอเรสเตอรอล (Cholesterol)", "Cholesterol"),
+        ("ไตรกลีเซอไรด์ (Triglyceride)", "TG"),
+        ("ไขมันดี (HDL)", "HDL"),
+        ("ไขมันเลว (LDL)", "LDL"),
+        ("การทำงานของไต (BUN)", "BUN"),
+        ("การทำงานของไต (Cr)", "Cr"),
+        ("ประสิทธิภาพการกรองของไต (GFR)", "GFR"),
+    ]
+
+    cbc_rows, blood_rows = [], []
+    for rows, config in ((cbc_rows, cbc_config), (blood_rows, blood_config)):
+        for name, metric in config:
+            result, is_abnormal = flag_value(lab_value(metric, "-"), metric, sex)
+            normal = NORMAL_TEXT[metric]
+            rows.append([(name, is_abnormal), (result, is_abnormal), (normal, is_abnormal)])
+
+    # ✅ Render ทั้งสองตาราง
+    cbc_col, blood_col = report.row([1, 3, 3, 1])
+
+    cbc_col.append(render_section_header("ผลการตรวจความสมบูรณ์ของเม็ดเลือด (Complete Blood Count)"))
+    cbc_col.append(styled_result_table(["ชื่อการตรวจ", "ผลตรวจ", "ค่าปกติ"], cbc_rows))
+
+    blood_col.append(render_section_header("ผลตรวจเลือด (Blood Test)"))
+    blood_col.append(styled_result_table(["ชื่อการตรวจ", "ผลตรวจ", "ค่าปกติ"], blood_rows))
+
+    # 🔍 ดึงค่าตามปีที่เลือก (ตัวเลขจาก MetricStore ส่งตรงให้ rule ไม่แปลงกลับเป็นข้อความ)
+    hb_raw = lab_value("hb")
+    wbc_raw = lab_value("wbc")
+    plt_raw = lab_value("plt")
+
+    # 🧠 แปลผล
+    hb_result = interpret_hb(hb_raw, sex)
+    wbc_result = interpret_cbc_wbc(wbc_raw)
+    plt_result = interpret_plt(plt_raw)
+
+    # 🩺 คำแนะนำ
+    recommendation = cbc_advice(hb_result, wbc_result, plt_result)
+
+    alp_raw = lab_value("ALK") or ""
+    sgot_raw = lab_value("SGOT") or ""
+    sgpt_raw = lab_value("SGPT") or ""
+
+    summary = summarize_liver(alp_raw, sgot_raw, sgpt_raw)
+    advice_liver = liver_advice(summary)
+
+    raw_value = lab_value("Uric") or ""
+    advice_uric = uric_acid_advice(raw_value)
+
+    # ✅ ดึงค่าจาก person ตามปีที่เลือก
+    gfr_raw = lab_value("GFR") or ""
+
+    # ✅ วิเคราะห์ผลการทำงานของไต และให้คำแนะนำ
+    kidney_summary = kidney_summary_gfr_only(gfr_raw)
+    advice_kidney = kidney_advice_from_summary(kidney_summary)
+
+    # ===============================
+    # ✅ คำแนะนำผลน้ำตาลในเลือด (FBS)
+    # ===============================
+
+    raw_value = lab_value("FBS") or ""
+    advice_fbs = fbs_advice(raw_value)
+
+    # ✅ ดึงค่าตามปีที่เลือก
+    chol_raw = lab_value("Cholesterol") or ""
+    tgl_raw = lab_value("TG") or ""
+    ldl_raw = lab_value("LDL") or ""
+
+    summary = summarize_lipids(chol_raw, tgl_raw, ldl_raw)
+    advice = lipids_advice(summary)
+
+    # ✅ รวมคำแนะนำทุกหมวด
+    all_advices = []
+
+    if advice_fbs:
+        all_advices.append(advice_fbs)
+
+    if advice_kidney:
+        all_advices.append(advice_kidney)
+
+    if advice_liver:
+        all_advices.append(advice_liver)
+
+    if advice_uric:
+        all_advices.append(advice_uric)
+
+    if advice:
+        all_advices.append(advice)  # คำแนะนำไขมันในเลือด
+
+    if recommendation and recommendation != "-":
+        all_advices.append(recommendation)
+
+    # ✅ แสดงผลรวม
+    final_advice = merge_final_advice_grouped(all_advices)
+
+    advice_col, = report.row([1, 6, 1])
+
+    advice_col.append(f"""
+    <div style="
+        background-color: rgba(33, 150, 243, 0.15);
+        padding: 2rem 2.5rem;
+        border-radius: 10px;
+        font-size: 16px;
+        line-height: 1.5;
+        color: inherit;
+    ">
+        <div style="font-size: 18px; font-weight: bold; margin-bottom: 1.5rem;">
+            📋 คำแนะนำสรุปผลตรวจสุขภาพ ปี {2500 + selected_year}
+        </div>
+        {final_advice}
+    </div>
+    """)
+
+    # ==================== Urinalysis & Additional Tests ====================
+    left_col, right_col = report.row([1, 3, 3, 1])
+
+    # 📌 Render: หัวข้อปัสสาวะ
+    left_col.append(render_section_header("ผลการตรวจปัสสาวะ (Urinalysis)"))
+
+    if "urine_color" in values:
+        # 🔎 ปี 68 เป็นต้นไปมีรายละเอียดครบ
+        urine_config = [
+            ("สี (Colour)", "urine_color"),
+            ("น้ำตาล (Sugar)", "urine_sugar"),
+            ("โปรตีน (Albumin)", "urine_alb"),
+            ("กรด-ด่าง (pH)", "urine_ph"),
+            ("ความถ่วงจำเพาะ (Sp.gr)", "urine_spgr"),
+            ("เม็ดเลือดแดง (RBC)", "urine_rbc"),
+            ("เม็ดเลือดขาว (WBC)", "urine_wbc"),
+            ("เซลล์เยื่อบุผิว (Squam.epit.)", "urine_sq_epi"),
+            ("อื่นๆ", "urine_other"),
+        ]
+
+        urine_rows = []
+        for name, metric in urine_config:
+            normal = NORMAL_TEXT[metric]
+            val_text, is_abn = flag_urine_value(lab_value(metric, "N/A"), metric)
+            urine_rows.append([(name, is_abn), (val_text, is_abn), (normal, is_abn)])
+
+        left_col.append(styled_result_table(["ชื่อการตรวจ", "ผลตรวจ", "ค่าปกติ"], urine_rows))
+
+        # ✅ คำแนะนำ
+        alb_raw = lab_value("urine_alb").strip()
+        sugar_raw = lab_value("urine_sugar").strip()
+        rbc_raw = lab_value("urine_rbc").strip()
+        wbc_raw = lab_value("urine_wbc").strip()
+
+        urine_advice = advice_urine(sex, alb_raw, sugar_raw, rbc_raw, wbc_raw)
+        if urine_advice:
+            left_col.append(
+                "<div class='advice-box' style='margin-top: 1rem;'>"
+                f"<div style='font-size: 18px; font-weight: bold;'>📌 คำแนะนำจากผลตรวจปัสสาวะ ปี {2500 + selected_year}</div>"
+                f"<div style='margin-top: 0.5rem;'>{urine_advice}</div>"
+                "</div>"
+            )
+
+    else:
+        # 🔎 ปี < 68 → ใช้ข้อมูลสรุปจากฟิลด์ "ผลปัสสาวะ<ปี>"
+        urine_text = lab_value("urine").strip()
+
+        if urine_text:
+            left_col.append(f"""
+            <div style='
+                margin-top: 1rem;
+                font-size: 16px;
+                line-height: 1.7;
+            '>{urine_text}</div>
+            """)
+        else:
+            left_col.append("""
+            <div style='
+                margin-top: 1rem;
+                padding: 1rem;
+                background-color: rgba(255,255,255,0.05);
+                font-size: 16px;
+                line-height: 1.7;
+            '>ไม่พบข้อมูลผลตรวจปัสสาวะในปีนี้</div>
+            """)
+
+    # ✅ ผลตรวจอุจจาระ + คำแนะนำ
+    stool_exam_raw = lab_value("stool_exam").strip()
+    stool_cs_raw = lab_value("stool_cs").strip()
+
+    exam_text = interpret_stool_exam(stool_exam_raw)
+    cs_text = interpret_stool_cs(stool_cs_raw)
+
+    left_col.append(render_section_header("ผลตรวจอุจจาระ (Stool Examination)"))
+    left_col.append(f"""
+    <p style='font-size: 16px; line-height: 1.7; margin-bottom: 1rem;'>
+        <b>ผลตรวจอุจจาระทั่วไป:</b> {exam_text}<br>
+        <b>ผลตรวจอุจจาระเพาะเชื้อ:</b> {cs_text}
+    </p>
+    """)
+
+    right_col.append(render_section_header("ผลเอกซเรย์ (Chest X-ray)"))
+
+    cxr_raw = lab_value("cxr")
+    cxr_result = interpret_cxr(cxr_raw)
+
+    right_col.append(f"<div class='result-box'>{cxr_result}</div>")
+
+    # ----------------------------
+
+    right_col.append(render_section_header("ผลคลื่นไฟฟ้าหัวใจ (EKG)"))
+
+    ekg_raw = lab_value("ekg")
+    ekg_result = interpret_ekg(ekg_raw)
+
+    right_col.append(f"<div class='result-box'>{ekg_result}</div>")
+
+    # ✅ Hepatitis Section (A & B)
+
+    hep_a_raw = interpret_hep(lab_value("hep_a"))
+
+    # 👉 หัวข้อ Hepatitis A
+    right_col.append(render_section_header("ผลการตรวจไวรัสตับอักเสบเอ (Viral hepatitis A)"))
+    right_col.append(f"<div class='result-box' style='text-align: left;'>{hep_a_raw}</div>")
+
+    # 👉 หัวข้อ Hepatitis B (ใหม่: รวมตาราง HBsAg/HBsAb/HBcAb)
+    right_col.append(render_section_header("ผลการตรวจไวรัสตับอักเสบบี (Viral hepatitis B)"))
+
+    # ผลไม่แยกปี อยู่ใน PersonRecord
+    hbsag_raw = person.hbsag
+    hbsab_raw = person.hbsab
+    hbcab_raw = person.hbcab
+
+    # แสดงผลแบบไม่มีพื้นหลังสีในแถวหัวตาราง
+    hepb_table = f"""
+    <table style='width:100%; font-size:16px; text-align:center; border-collapse: collapse; margin-bottom: 1rem;'>
+        <thead>
+            <tr style='font-weight:bold; border-bottom: 1px solid #ccc;'>
+                <th>HBsAg</th>
+                <th>HBsAb</th>
+                <th>HBcAb</th>
+            </tr>
+        </thead>
+        <tbody>
+            <tr>
+                <td>{hbsag_raw}</td>
+                <td>{hbsab_raw}</td>
+                <td>{hbcab_raw}</td>
+            </tr>
+        </tbody>
+    </table>
+    """
+    right_col.append(hepb_table)
+
+    # แสดงคำแนะนำ
+    right_col.append(f"<div class='advice-box'>{hepatitis_b_advice(hbsag_raw, hbsab_raw, hbcab_raw)}</div>")
+
+    doctor_col, = report.row([1, 6, 1])
+
+    doctor_col.append(_DOCTOR_BLOCK)
+    return report
+
+
+# ==================== REPORT CACHE ====================
+REPORT_CACHE_SIZE = 256
+
+
+def _content_hash(person, values):
+    # แถวถูกแก้ในชีต -> hash เปลี่ยน -> ไม่ใช้รายงานเก่าอีก (entry เก่าหลุดออกตาม LRU)
+    parts = [*person.key(), *values, *map(str, values.values())]
+    return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).digest()
+
+
+class ReportCache:
+    # LRU ของ Report ที่สร้างเสร็จแล้ว key = (hash เนื้อหาแถว, ปี) ใช้ร่วมกันทุก session ห้ามแก้ Report ที่ได้ไป
+    def __init__(self, maxsize=REPORT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, person, values, year):
+        key = (_content_hash(person, values), year)
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return report
+            self.misses += 1
+        report = build_report(person, values, year)
+        with self._lock:
+            self._entries[key] = report
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return report
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def prefetch_reports(cache, store, person, row):
+    # สร้างรายงานทุกปีของคนเดียวใน thread พื้นหลัง (ปีล่าสุดก่อน) dict ที่คืนไปจะมีปีที่เสร็จแล้วเพิ่มเข้ามาเรื่อย ๆ
+    reports = {}
+
+    def work():
+        for year in sorted(store.years, reverse=True):
+            reports[year] = cache.get(person, year_values(store, row, year), year)
+
+    threading.Thread(target=work, daemon=True).start()
+    return reports
+
+
+def iter_page(report, title="รายงานผลการตรวจสุขภาพ"):
+    # หน้า HTML เดี่ยวสำหรับพิมพ์ (ใช้ใน batch.py) ทีละชิ้น เขียนลงไฟล์ได้เลยไม่ต้องต่อสตริงทั้งหน้า
+    # วางบล็อกแบบเดียวกับ st.columns ในแอป
+    yield _PAGE_TITLE
+    yield html.escape(title)
+    yield _PAGE_HEAD
+    for spec, columns in report.blocks:
+        if spec is None:
+            yield from columns[0]
+            continue
+        yield _ROW_OPEN(" ".join(f"{weight}fr" for weight in spec))
+        for column in columns:
+            yield "<div>"
+            yield from column
+            yield "</div>"
+        yield "<div></div></div>"
+    yield _PAGE_TAIL
+
+
+def render_page(report, title="รายงานผลการตรวจสุขภาพ"):
+    return "".join(iter_page(report, title))
+
+
+_PAGE_TITLE = """<!DOCTYPE html>
+<html lang="th">
+<head>
+<meta charset="utf-8">
+<title>"""
+_PAGE_HEAD = (
+    "</title>\n"
+    + FONT_STYLE
+    + REPORT_STYLE
+    + """<style>
+    .report-row { display: grid; gap: 1rem; }
+    @media print { .report-row { break-inside: avoid; } }
+</style>
+</head>
+<body>
+"""
+)
+_ROW_OPEN = "<div class='report-row' style='grid-template-columns: {};'><div></div>".format
+_PAGE_TAIL = """
+</body>
+</html>
+"""
@@ -0,0 +1,320 @@
+import numpy as np
+import pandas as pd
+
+from ranges import HIGH, LOW, reference
+from schema import years, columns_by_year, blood_columns_by_year, cbc_columns_by_year
+
+# ==================== SCALAR RULES ====================
+def to_float(value, strip_commas=False):
+    # ค่าจาก MetricStore เป็นตัวเลขแล้ว (แปลงครั้งเดียวตอนโหลด) ไม่ต้อง parse ซ้ำ
+    # ข้อความ (เซลล์ดิบ/ค่าจากที่อื่น) parse แบบเดิม ไม่ได้ = None
+    # NaN (ค่าว่างจาก store หรือข้อความ "nan") = None เช่นกัน: เทียบกับเกณฑ์ใดก็ได้ False จะหลุดไปเป็น "สูง"
+    if isinstance(value, (int, float)):
+        value = float(value)
+        return None if np.isnan(value) else value
+    text = str(value).strip()
+    if strip_commas:
+        text = text.replace(",", "").strip()
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return None if np.isnan(value) else value
+
+def interpret_bmi(bmi):
+    bmi = to_float(bmi)
+    if bmi is None:
+        return "-"
+    if bmi > 30:
+        return "อ้วนมาก"
+    elif bmi >= 25:
+        return "อ้วน"
+    elif bmi >= 23:
+        return "น้ำหนักเกิน"
+    elif bmi >= 18.5:
+        return "ปกติ"
+    else:
+        return "ผอม"
+
+def interpret_bp(sbp, dbp):
+    sbp, dbp = to_float(sbp), to_float(dbp)
+    if sbp is None or dbp is None:
+        return "-"
+    if sbp == 0 or dbp == 0:
+        return "-"
+    if sbp >= 160 or dbp >= 100:
+        return "ความดันสูง"
+    elif sbp >= 140 or dbp >= 90:
+        return "ความดันสูงเล็กน้อย"
+    elif sbp < 120 and dbp < 80:
+        return "ความดันปกติ"
+    else:
+        return "ความดันค่อนข้างสูง"
+
+def interpret_wbc(wbc):
+    wbc = to_float(wbc)
+    if wbc is None:
+        return "-"
+    if wbc == 0:
+        return "-"
+    return reference("wbc").label(wbc)
+
+def interpret_hb(hb, sex):
+    hb = to_float(hb)
+    if hb is None:
+        return "-"
+    if sex not in ("ชาย", "หญิง"):
+        return "-"
+    return reference("hb", sex).label(hb)
+
+def interpret_plt(plt):
+    plt = to_float(plt)
+    if plt is None:
+        return "-"
+    if plt == 0:
+        return "-"
+    return reference("plt").label(plt)
+
+LIVER_HIGH = "การทำงานของตับสูงกว่าเกณฑ์ปกติเล็กน้อย"
+
+def summarize_liver(alp_val, sgot_val, sgpt_val):
+    alp, sgot, sgpt = to_float(alp_val), to_float(sgot_val), to_float(sgpt_val)
+    if alp is None or sgot is None or sgpt is None:
+        return "-"
+    if alp == 0 or sgot == 0 or sgpt == 0:
+        return "-"
+    if any(reference(analyte).direction(value) in HIGH
+           for analyte, value in (("ALK", alp), ("SGOT", sgot), ("SGPT", sgpt))):
+        return LIVER_HIGH
+    return "ปกติ"
+
+URIC_ADVICE = "ควรลดอาหารที่มีพิวรีนสูง เช่น เครื่องในสัตว์ อาหารทะเล และพบแพทย์หากมีอาการปวดข้อ"
+
+def uric_acid_advice(value_raw):
+    value = to_float(value_raw)
+    if value is None:
+        return "-"
+    if reference("Uric").direction(value) in HIGH:
+        return URIC_ADVICE
+    return ""
+
+# 🧪 แปลผลการทำงานของไตจาก GFR
+KIDNEY_LOW = "การทำงานของไตต่ำกว่าเกณฑ์ปกติเล็กน้อย"
+
+def kidney_summary_gfr_only(gfr_raw):
+    gfr = to_float(gfr_raw, strip_commas=True)
+    if gfr is None:
+        return ""
+    if gfr == 0:
+        return ""
+    if reference("GFR").direction(gfr) in LOW:
+        return KIDNEY_LOW
+    return "ปกติ"
+
+# ป้ายช่วง FBS (ranges.py) -> คำแนะนำ
+FBS_ADVICE = {
+    "เริ่มสูงเล็กน้อย": "ระดับน้ำตาลเริ่มสูงเล็กน้อย ควรปรับพฤติกรรมการบริโภคอาหารหวาน แป้ง และออกกำลังกาย",
+    "สูงเล็กน้อย": "ระดับน้ำตาลสูงเล็กน้อย ควรลดอาหารหวาน แป้ง ของมัน ตรวจติดตามน้ำตาลซ้ำ และออกกำลังกายสม่ำเสมอ",
+    "สูง": "ระดับน้ำตาลสูง ควรพบแพทย์เพื่อตรวจยืนยันเบาหวาน และติดตามอาการ",
+}
+
+def fbs_advice(fbs_raw):
+    value = to_float(fbs_raw, strip_commas=True)
+    if value is None:
+        return ""
+    if value == 0:
+        return ""
+    return FBS_ADVICE.get(reference("FBS").label(value), "")
+
+# 🧪 ฟังก์ชันสรุปผลไขมันในเลือด
+def summarize_lipids(chol_raw, tgl_raw, ldl_raw):
+    chol, tgl, ldl = (to_float(raw, strip_commas=True) for raw in (chol_raw, tgl_raw, ldl_raw))
+    if chol is None or tgl is None or ldl is None:
+        return ""
+    if chol == 0 and tgl == 0:
+        return ""
+    directions = [reference(analyte).direction(value)
+                  for analyte, value in (("Cholesterol", chol), ("TG", tgl), ("LDL", ldl))]
+    if "very_high" in directions:
+        return "ไขมันในเลือดสูง"
+    if not any(direction in HIGH for direction in directions):
+        return "ปกติ"
+    return "ไขมันในเลือดสูงเล็กน้อย"
+
+# ==================== COHORT ENGINE ====================
+# แปลผลทั้งชีตในครั้งเดียวด้วย np.select ผลลัพธ์ต้องตรงกับ scalar rule ด้านบน
+# ทุกเซลล์ (เทียบกับการเรียก rule ด้วย str(cell).strip())
+
+def _parse_column(df, col, strip_commas=False):
+    # parse แค่ค่าที่ไม่ซ้ำกันด้วย float() ตัวเดียวกับ scalar rule แล้วกระจายกลับด้วย codes
+    n = len(df)
+    if col is None or col not in df.columns:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+    series = df[col]
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        # คอลัมน์ที่แปลงเป็นตัวเลขตอนโหลดแล้ว (sheet.prepare_frame): NaN คือช่องว่าง
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return values, ~np.isnan(values)
+    codes, uniques = pd.factorize(series)
+    parsed = [to_float(u, strip_commas) for u in uniques]
+    ok = np.array([p is not None for p in parsed] + [False], dtype=bool)
+    vals = np.array([np.nan if p is None else p for p in parsed] + [np.nan], dtype=float)
+    values, valid = vals[codes], ok[codes]
+    # factorize รวม None/NaN เป็นค่าเดียว แต่ str(None) กับ str(nan) parse ได้ไม่เหมือนกัน
+    missing = np.flatnonzero(codes == -1)
+    for i in missing:
+        p = to_float(series.iat[i], strip_commas)
+        if p is not None:
+            values[i], valid[i] = p, True
+    return values, valid
+
+def _select(valid, invalid_label, conditions, choices, default):
+    out = np.select(conditions, choices, default=default).astype(object)
+    out[~valid] = invalid_label
+    return out
+
+def _bmi_labels(weight, w_ok, height, h_ok):
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        bmi = weight / ((height / 100) ** 2)
+    # inf/inf = NaN: interpret_bmi ถือเป็นค่าว่าง (to_float)
+    valid = w_ok & h_ok & (height != 0) & ~np.isnan(bmi)
+    return _select(valid, "-", [
+        bmi > 30,
+        bmi >= 25,
+        bmi >= 23,
+        bmi >= 18.5,
+    ], ["อ้วนมาก", "อ้วน", "น้ำหนักเกิน", "ปกติ"], "ผอม")
+
+def _bp_labels(sbp, s_ok, dbp, d_ok):
+    valid = s_ok & d_ok
+    return _select(valid, "-", [
+        (sbp == 0) | (dbp == 0),
+        (sbp >= 160) | (dbp >= 100),
+        (sbp >= 140) | (dbp >= 90),
+        (sbp < 120) & (dbp < 80),
+    ], ["-", "ความดันสูง", "ความดันสูงเล็กน้อย", "ความดันปกติ"], "ความดันค่อนข้างสูง")
+
+def _hb_labels(hb, ok, sex):
+    out = np.full(len(hb), "-", dtype=object)
+    for s in ("ชาย", "หญิง"):
+        mask = ok & (sex == s)
+        out[mask] = reference("hb", s).labels_of(hb[mask])
+    return out
+
+def _count_labels(analyte, values, ok):
+    # wbc/plt: 0 = ไม่ได้ตรวจ
+    out = reference(analyte).labels_of(values)
+    out[~ok | (values == 0)] = "-"
+    return out
+
+def _wbc_labels(wbc, ok):
+    return _count_labels("wbc", wbc, ok)
+
+def _plt_labels(plt, ok):
+    return _count_labels("plt", plt, ok)
+
+def _is_high(analyte, values):
+    return np.isin(reference(analyte).directions_of(values), HIGH)
+
+def _liver_labels(alp, a_ok, sgot, o_ok, sgpt, p_ok):
+    valid = a_ok & o_ok & p_ok
+    return _select(valid, "-", [
+        (alp == 0) | (sgot == 0) | (sgpt == 0),
+        _is_high("ALK", alp) | _is_high("SGOT", sgot) | _is_high("SGPT", sgpt),
+    ], ["-", LIVER_HIGH], "ปกติ")
+
+def _lipid_labels(chol, c_ok, tgl, t_ok, ldl, l_ok):
+    valid = c_ok & t_ok & l_ok
+    directions = [reference(analyte).directions_of(values)
+                  for analyte, values in (("Cholesterol", chol), ("TG", tgl), ("LDL", ldl))]
+    return _select(valid, "", [
+        (chol == 0) & (tgl == 0),
+        np.logical_or.reduce([d == "very_high" for d in directions]),
+        ~np.logical_or.reduce([np.isin(d, HIGH) for d in directions]),
+    ], ["", "ไขมันในเลือดสูง", "ปกติ"], "ไขมันในเลือดสูงเล็กน้อย")
+
+def _gfr_labels(gfr, ok):
+    return _select(ok, "", [
+        gfr == 0,
+        np.isin(reference("GFR").directions_of(gfr), LOW),
+    ], ["", KIDNEY_LOW], "ปกติ")
+
+def _fbs_labels(fbs, ok):
+    out = reference("FBS").lookup(fbs, FBS_ADVICE)
+    out[~ok | (fbs == 0)] = ""
+    return out
+
+def _uric_labels(uric, ok):
+    return _select(ok, "-", [_is_high("Uric", uric)], [URIC_ADVICE], "")
+
+COHORT_RULES = ["bmi", "bp", "hb", "wbc", "plt", "liver", "lipids", "gfr", "fbs", "uric"]
+
+def interpret_cohort(df, years=years):
+    """แปลผลทุกคน ทุกปี คืน DataFrame คอลัมน์แบบ MultiIndex (rule, year) index เดียวกับ df"""
+    if "เพศ" in df.columns:
+        sex = np.array([str(v).strip() for v in df["เพศ"]], dtype=object)
+    else:
+        sex = np.full(len(df), "", dtype=object)
+
+    results = {}
+    for y in years:
+        vitals = columns_by_year.get(y, {})
+        blood = blood_columns_by_year.get(y, {})
+        cbc = cbc_columns_by_year.get(y, {})
+
+        weight = _parse_column(df, vitals.get("weight"))
+        height = _parse_column(df, vitals.get("height"))
+        sbp = _parse_column(df, vitals.get("sbp"))
+        dbp = _parse_column(df, vitals.get("dbp"))
+
+        results[("bmi", y)] = _bmi_labels(*weight, *height)
+        results[("bp", y)] = _bp_labels(*sbp, *dbp)
+        results[("hb", y)] = _hb_labels(*_parse_column(df, cbc.get("hb")), sex)
+        results[("wbc", y)] = _wbc_labels(*_parse_column(df, cbc.get("wbc")))
+        results[("plt", y)] = _plt_labels(*_parse_column(df, cbc.get("plt")))
+        results[("liver", y)] = _liver_labels(
+            *_parse_column(df, blood.get("ALK")),
+            *_parse_column(df, blood.get("SGOT")),
+            *_parse_column(df, blood.get("SGPT")),
+        )
+        results[("lipids", y)] = _lipid_labels(
+            *_parse_column(df, blood.get("Cholesterol"), strip_commas=True),
+            *_parse_column(df, blood.get("TG"), strip_commas=True),
+            *_parse_column(df, blood.get("LDL"), strip_commas=True),
+        )
+        results[("gfr", y)] = _gfr_labels(*_parse_column(df, blood.get("GFR"), strip_commas=True))
+        results[("fbs", y)] = _fbs_labels(*_parse_column(df, blood.get("FBS"), strip_commas=True))
+        results[("uric", y)] = _uric_labels(*_parse_column(df, blood.get("Uric")))
+
+    columns = pd.MultiIndex.from_product([COHORT_RULES, list(years)], names=["rule", "year"])
+    return pd.DataFrame({key: results[key] for key in columns}, index=df.index, columns=columns)
+
+# ==================== PREVALENCE FLAGS ====================
+# ใช้ทำภาพรวมกลุ่ม (cohort.py): ต่อคนในปีหนึ่ง -> (ได้ตรวจ, ผิดปกติ) ใช้ป้ายชุดเดียวกับรายงาน
+# ความดันนับเฉพาะ >= 140/90 (ความดันสูง/สูงเล็กน้อย) FBS นับทุกค่านอกช่วง normal
+
+PREVALENCE_RULES = ["fbs", "lipids", "gfr", "liver", "bmi", "bp"]
+
+def prevalence_flags(values):
+    """values(metric) -> (ค่า float ของทุกคน, มีค่า) คืน {rule: (tested, abnormal)} อาร์เรย์ bool"""
+    flags = {}
+
+    fbs, ok = values("FBS")
+    tested = ok & (fbs != 0)
+    flags["fbs"] = tested, tested & (reference("FBS").directions_of(fbs) != "normal")
+
+    labels = _lipid_labels(*values("Cholesterol"), *values("TG"), *values("LDL"))
+    flags["lipids"] = labels != "", (labels != "") & (labels != "ปกติ")
+
+    labels = _gfr_labels(*values("GFR"))
+    flags["gfr"] = labels != "", labels == KIDNEY_LOW
+
+    labels = _liver_labels(*values("ALK"), *values("SGOT"), *values("SGPT"))
+    flags["liver"] = labels != "-", labels == LIVER_HIGH
+
+    labels = _bmi_labels(*values("weight"), *values("height"))
+    flags["bmi"] = labels != "-", (labels != "-") & (labels != "ปกติ")
+
+    labels = _bp_labels(*values("sbp"), *values("dbp"))
+    flags["bp"] = labels != "-", np.isin(labels, ["ความดันสูง", "ความดันสูงเล็กน้อย"])
+    return flags
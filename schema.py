@@ -0,0 +1,144 @@
+import re
+from collections import defaultdict
+
+# ==================== YEAR MAPPING ====================
+years = list(range(61, 69))
+columns_by_year = {
+    y: {
+        "weight": f"น้ำหนัก{y}" if y != 68 else "น้ำหนัก",
+        "height": f"ส่วนสูง{y}" if y != 68 else "ส่วนสูง",
+        "waist": f"รอบเอว{y}" if y != 68 else "รอบเอว",
+        "sbp": f"SBP{y}" if y != 68 else "SBP",
+        "dbp": f"DBP{y}" if y != 68 else "DBP",
+        "pulse": f"pulse{y}" if y != 68 else "pulse",
+    }
+    for y in years
+}
+
+# ==================== BLOOD COLUMN MAPPING ====================
+blood_columns_by_year = {
+    y: {
+        "FBS": f"FBS{y}",
+        "Uric": f"Uric Acid{y}",
+        "ALK": f"ALP{y}",
+        "SGOT": f"SGOT{y}",
+        "SGPT": f"SGPT{y}",
+        "Cholesterol": f"CHOL{y}",
+        "TG": f"TGL{y}",
+        "HDL": f"HDL{y}",
+        "LDL": f"LDL{y}",
+        "BUN": f"BUN{y}",
+        "Cr": f"Cr{y}",
+        "GFR": f"GFR{y}",
+    }
+    for y in years
+}
+
+# ==================== CBC COLUMN MAPPING ====================
+cbc_columns_by_year = defaultdict(dict)
+
+for year in years:
+    cbc_columns_by_year[year] = {
+        "hb": f"Hb(%)" + str(year),
+        "hct": f"HCT" + str(year),
+        "wbc": f"WBC (cumm)" + str(year),
+        "plt": f"Plt (/mm)" + str(year),
+    }
+
+    if year == 68:
+        cbc_columns_by_year[year].update({
+            "ne": "Ne (%)68",
+            "ly": "Ly (%)68",
+            "eo": "Eo68",
+            "mo": "M68",
+            "ba": "BA68",
+            "rbc": "RBCmo68",
+            "mcv": "MCV68",
+            "mch": "MCH68",
+            "mchc": "MCHC",
+        })
+
+# ==================== TYPED COLUMNS ====================
+# คอลัมน์ตัวเลข (สัญญาณชีพ/ผลแล็บทุกปี) แปลงเป็น float ครั้งเดียวตอนโหลด
+lab_columns = sorted({
+    col
+    for mapping in (columns_by_year, blood_columns_by_year, cbc_columns_by_year)
+    for cols in mapping.values()
+    for col in cols.values()
+})
+id_columns = ["เลขบัตรประชาชน", "HN", "ชื่อ-สกุล"]
+
+# ==================== REPORT COLUMN MAPPING ====================
+# คอลัมน์อื่นที่หน้ารายงานอ่าน (ข้อมูลส่วนตัว ปัสสาวะ อุจจาระ CXR EKG ไวรัสตับอักเสบ)
+profile_columns = id_columns + ["อายุ", "เพศ", "หน่วยงาน", "วันที่ตรวจ"]
+hepatitis_b_columns = ["HbsAg", "HbsAb", "HBcAB"]
+exam_columns_by_year = {
+    y: {
+        "urine": f"ผลปัสสาวะ{y}",
+        "stool_exam": f"Stool exam{y}" if y != 68 else "Stool exam",
+        "stool_cs": f"Stool C/S{y}" if y != 68 else "Stool C/S",
+        "cxr": f"CXR{y}" if y != 68 else "CXR",
+        "ekg": f"EKG{y}" if y != 68 else "EKG",
+        "hep_a": f"Hepatitis A{y}",
+        "hep_b": f"Hepatitis B{y}",
+    }
+    for y in years
+}
+# ปี 68 มีผลปัสสาวะแยกรายการ
+exam_columns_by_year[68].update({
+    "urine_color": "Color68",
+    "urine_sugar": "sugar68",
+    "urine_alb": "Alb68",
+    "urine_ph": "pH68",
+    "urine_spgr": "Spgr68",
+    "urine_rbc": "RBC168",
+    "urine_wbc": "WBC168",
+    "urine_sq_epi": "SQ-epi68",
+    "urine_other": "ORTER68",
+})
+
+# ทุกคอลัมน์ที่รายงานใช้ โหลดเฉพาะชุดนี้จากชีต (ดู SheetSync)
+report_columns = sorted(
+    set(profile_columns)
+    | set(lab_columns)
+    | set(hepatitis_b_columns)
+    | {col for cols in exam_columns_by_year.values() for col in cols.values()}
+)
+
+# ==================== YEAR SUFFIX ====================
+# ชื่อคอลัมน์ = ชื่อฐาน + เลขปี 2 หลัก (ปีล่าสุดบางคอลัมน์ไม่มีเลขปี เช่น "น้ำหนัก", "CXR")
+_YEAR_SUFFIX = re.compile(r"^(.+?)(\d{2})$")
+YEAR_MIN = 50  # เลขท้ายชื่อที่น้อยกว่านี้ไม่ถือเป็นปี
+
+
+def split_year(col):
+    # "FBS61" -> ("FBS", 61), "RBC168" -> ("RBC1", 68), "CXR" -> ("CXR", None)
+    match = _YEAR_SUFFIX.match(col)
+    if match and int(match.group(2)) >= YEAR_MIN:
+        return match.group(1), int(match.group(2))
+    return col, None
+
+
+# ชื่อฐาน -> ชื่อตัวชี้วัด เช่น "น้ำหนัก" -> "weight", "Hb(%)" -> "hb", "RBC1" -> "urine_rbc"
+metric_by_base = {
+    split_year(col)[0]: key
+    for mapping in (columns_by_year, blood_columns_by_year, cbc_columns_by_year, exam_columns_by_year)
+    for cols in mapping.values()
+    for key, col in cols.items()
+}
+
+
+# ตัวชี้วัดแล็บ/สัญญาณชีพ (ค่าเป็นตัวเลขเสมอ)
+lab_metrics = {metric_by_base[split_year(col)[0]] for col in lab_columns}
+
+
+def is_lab_column(col):
+    # รวมคอลัมน์ปีใหม่ (เช่น FBS69) ที่ยังไม่อยู่ใน lab_columns
+    base = split_year(str(col).strip())[0]
+    return base in metric_by_base and metric_by_base[base] in lab_metrics
+
+
+def is_report_column(col):
+    # รวมคอลัมน์ปีใหม่ของตัวชี้วัดที่รู้จัก (เช่น FBS69) แม้ยังไม่อยู่ใน report_columns
+    col = str(col).strip()
+    return col in report_columns or split_year(col)[0] in metric_by_base
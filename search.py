@@ -0,0 +1,179 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from timing import timed
+
+# ==================== SEARCH INDEX ====================
+# สร้างครั้งเดียวตอนโหลดชีต: ค่า (strip แล้ว) -> ตำแหน่งแถวใน df
+SEARCH_COLUMNS = ["เลขบัตรประชาชน", "HN", "ชื่อ-สกุล"]
+PREFIX_COLUMNS = SEARCH_COLUMNS[:2]  # เลขบัตร/HN: พิมพ์ไม่ครบก็ค้นจากต้นเลขได้
+CANDIDATE_LIMIT = 10
+_PREFIX_END = chr(0x10FFFF)  # ใหญ่กว่าทุกตัวอักษร: prefix + นี้ = ขอบบนของช่วงที่ขึ้นต้นด้วย prefix
+
+_NO_ROWS = np.array([], dtype=np.intp)
+
+# ==================== NAME INDEX ====================
+# ชื่อพิมพ์ผิด/สลับคำนำหน้า/พิมพ์แค่บางส่วน: ตัดคำนำหน้าและช่องว่างแล้วแตกเป็น n-gram ตัวอักษร
+# inverted index: n-gram -> เลขชื่อ (ชื่อไม่ซ้ำ) คะแนน = เฉลี่ยของสัดส่วน n-gram ของคำค้นที่พบ กับ Dice
+# n = 2: สระ/วรรณยุกต์ไทยเป็นตัวอักษรแยก 3 ตัวอาจเป็นแค่พยางค์เดียว trigram จึงพลาดง่ายกับคำค้นสั้นหรือพิมพ์ผิด
+NAME_NGRAM = 2
+MIN_NAME_SCORE = 0.4
+_TITLES = ["นางสาว", "นาง", "นาย", "น.ส.", "น.ส", "ด.ช.", "ด.ญ.", "เด็กชาย", "เด็กหญิง", "ดร.", "mr.", "mrs.", "miss", "ms."]
+_TITLE_PATTERN = re.compile("^(?:" + "|".join(map(re.escape, _TITLES)) + ")")
+_NAME_JUNK = re.compile("[\\s.\u200b]+")  # ช่องว่าง จุด zero-width space
+
+
+def normalize_name(name):
+    name = _TITLE_PATTERN.sub("", str(name).strip().lower(), count=1)
+    return _NAME_JUNK.sub("", name)
+
+
+def _ngrams(text, n=NAME_NGRAM):
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _group(codes, n):
+    # รหัสกลุ่มต่อสมาชิก -> list ของอาร์เรย์ตำแหน่งสมาชิกแต่ละกลุ่ม (รหัส 0..n-1)
+    order = np.argsort(codes, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(codes, minlength=n))[:-1])[:n]
+
+
+class NameIndex:
+    def __init__(self, names):
+        keys = [normalize_name(name) for name in names.astype(str).tolist()]
+        codes, uniques = pd.factorize(np.array(keys, dtype=object))
+        self.names = uniques.tolist()
+        self.name_of = codes.astype(np.int32)  # ตำแหน่งแถว -> เลขชื่อ
+        self.rows = _group(codes, len(self.names))  # เลขชื่อ -> ตำแหน่งแถว
+        self.by_name = {name: i for i, name in enumerate(self.names)}
+
+        grams = [_ngrams(name) for name in self.names]
+        self.sizes = np.fromiter(map(len, grams), dtype=np.int32, count=len(grams))
+        gram_codes, gram_uniques = pd.factorize(np.array([g for gs in grams for g in gs], dtype=object))
+        owners = np.repeat(np.arange(len(self.names), dtype=np.int32), self.sizes)
+        self.postings = {
+            gram: owners[members]
+            for gram, members in zip(gram_uniques.tolist(), _group(gram_codes, len(gram_uniques)))
+        }
+
+    def _scores(self, key):
+        # คะแนนของทุกชื่อเทียบกับคำค้น (normalize แล้ว) ชื่อที่ตรงทุกตัวได้ 2 ให้อยู่หน้าสุดเสมอ
+        grams = _ngrams(key)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if hits:
+            common = np.bincount(np.concatenate(hits), minlength=len(self.names))
+            score = (common / len(grams) + 2 * common / (len(grams) + self.sizes)) / 2
+        else:
+            score = np.zeros(len(self.names))
+        exact = self.by_name.get(key)
+        if exact is not None:
+            score[exact] = 2.0
+        return score
+
+    @timed("name_search")
+    def search(self, query, limit=CANDIDATE_LIMIT, min_score=MIN_NAME_SCORE):
+        # [(ตำแหน่งแถว, คะแนน)] เรียงคะแนนมากไปน้อย ชื่อที่ตรงทุกตัว (หลังตัดคำนำหน้า) มาก่อนเสมอ
+        key = normalize_name(query)
+        if not key or not self.names:
+            return []
+        score = self._scores(key)
+        top = np.flatnonzero(score >= min_score)
+        if len(top) > limit:
+            top = top[np.argpartition(-score[top], limit)[:limit]]
+        top = top[np.argsort(-score[top], kind="stable")]
+        out = []
+        for i in top:
+            out.extend((int(row), float(score[i])) for row in self.rows[i])
+            if len(out) >= limit:
+                break
+        return out[:limit]
+
+    def rank_rows(self, query, rows):
+        # เรียงแถวที่กำหนดตามความใกล้ของชื่อ (ไม่ตัดทิ้ง)
+        key = normalize_name(query)
+        rows = np.asarray(rows, dtype=np.intp)
+        if not key or not len(rows):
+            return rows.tolist()
+        score = self._scores(key)[self.name_of[rows]]
+        return rows[np.argsort(-score, kind="stable")].tolist()
+
+
+class SearchIndex:
+    def __init__(self, df):
+        self.size = len(df)
+        self.by_column = {}
+        self.values = {}  # เลขบัตร/HN ต่อแถว (strip แล้ว) ไว้กรองช่องที่สอง
+        self.sorted_keys = {}  # ค่าไม่ซ้ำเรียงแล้ว: ขึ้นต้นด้วย prefix = ช่วงต่อเนื่องหาได้ด้วย searchsorted
+        for col in SEARCH_COLUMNS:
+            keys = df[col].astype(str).str.strip() if col in df.columns else pd.Series("", index=df.index)
+            self.by_column[col] = keys.groupby(keys, sort=False).indices if col in df.columns else {}
+            if col in PREFIX_COLUMNS:
+                self.values[col] = np.asarray(keys.tolist(), dtype=object)
+                self.sorted_keys[col] = np.array(sorted(self.by_column[col]), dtype=str)
+        names = df[SEARCH_COLUMNS[2]] if SEARCH_COLUMNS[2] in df.columns else pd.Series("", index=df.index)
+        self.names = NameIndex(names)
+
+    @timed("search")
+    def find(self, id_card="", hn="", full_name=""):
+        # คืนตำแหน่งแถว (เรียงจากน้อยไปมาก) ที่ตรงทุกเงื่อนไขที่กรอกมา
+        rows = None
+        for col, value in zip(SEARCH_COLUMNS, (id_card, hn, full_name)):
+            value = value.strip()
+            if not value:
+                continue
+            hits = self.by_column[col].get(value, _NO_ROWS)
+            rows = hits if rows is None else np.intersect1d(rows, hits, assume_unique=True)
+            if len(rows) == 0:
+                return _NO_ROWS
+        if rows is None:
+            # ไม่ได้กรอกอะไรเลย = ทุกแถว (เหมือนเดิม)
+            return np.arange(self.size)
+        return rows
+
+    def _prefix_keys(self, col, prefix):
+        keys = self.sorted_keys[col]
+        lo = np.searchsorted(keys, prefix, side="left")
+        hi = np.searchsorted(keys, prefix + _PREFIX_END, side="left")
+        return keys[lo:hi]
+
+    @timed("complete")
+    def complete(self, col, prefix, limit=CANDIDATE_LIMIT):
+        # ค่าของ col ที่ขึ้นต้นด้วย prefix (เรียงตามค่า) limit ตัวแรก ไม่ต้องไล่ทั้ง DataFrame
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        return self._prefix_keys(col, prefix)[:limit].tolist()
+
+    def prefix_rows(self, id_card="", hn="", limit=CANDIDATE_LIMIT):
+        # แถวที่เลขบัตร/HN ขึ้นต้นด้วยค่าที่กรอก เรียงตามช่องแรกที่กรอก ช่องที่สองใช้กรอง
+        given = [(col, value.strip()) for col, value in zip(PREFIX_COLUMNS, (id_card, hn)) if value.strip()]
+        if not given:
+            return []
+        (col, prefix), others = given[0], given[1:]
+        rows = []
+        for key in self._prefix_keys(col, prefix).tolist():
+            rows.extend(
+                int(row) for row in self.by_column[col][key]
+                if all(self.values[c][row].startswith(p) for c, p in others)
+            )
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+
+    def candidates(self, id_card="", hn="", full_name="", limit=CANDIDATE_LIMIT):
+        # รายชื่อให้เลือก: เลขบัตร/HN ตรงทุกตัวก่อน ไม่พบค่อยใช้ที่ขึ้นต้นด้วยเลขที่กรอก
+        # ชื่อค้นแบบใกล้เคียง (ตรงทุกตัวมาก่อน)
+        if not full_name.strip():
+            rows = self.find(id_card, hn)[:limit].tolist()
+            return rows or self.prefix_rows(id_card, hn, limit)
+        if not (id_card.strip() or hn.strip()):
+            return [row for row, _ in self.names.search(full_name, limit)]
+        # กรอกเลขด้วย: เลขใช้คัด ชื่อใช้แค่เรียงลำดับ (แถวที่ชื่อไม่ใกล้เลยยังอยู่ท้ายรายการ)
+        rows = self.find(id_card, hn)
+        if not len(rows):
+            rows = self.prefix_rows(id_card, hn, self.size)
+        return self.names.rank_rows(full_name, rows)[:limit]
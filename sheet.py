@@ -0,0 +1,580 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+import gspread
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from gspread.utils import numericise_all, rowcol_to_a1
+from oauth2client.service_account import ServiceAccountCredentials
+
+from schema import id_columns, is_lab_column, is_report_column
+from timing import stage
+
+SHEET_URL = "https://docs.google.com/spreadsheets/d/1N3l0o_Y6QYbGKx22323mNLPym77N0jkJfyxXFM2BDmc"
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# ==================== SNAPSHOT ====================
+# สำเนาชีตล่าสุดแบบ Arrow IPC (ไม่บีบอัด) บนดิสก์ โปรเซสใหม่ memory-map ได้ทันที
+SNAPSHOT_PATH = os.environ.get(
+    "SHEET_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sheet.arrow"),
+)
+SNAPSHOT_SCHEMA_VERSION = 2  # 2: เก็บ frame ที่ผ่าน prepare_frame แล้ว
+# snapshot ที่เก่ากว่านี้จะไม่ใช้ตอน cold start (ดึงจาก Google ใหม่เลย)
+SNAPSHOT_MAX_AGE = 24 * 60 * 60
+SHEET_TTL = 300
+# รีเฟรชเบื้องหลังล้มเหลว: รอ 10, 20, 40 ... วินาที (สูงสุด 10 นาที) ก่อนลองใหม่
+REFRESH_BACKOFF_BASE = 10
+REFRESH_BACKOFF_MAX = 600
+
+
+def open_worksheet(service_account_info):
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, SCOPE)
+    client = gspread.authorize(creds)
+    return client.open_by_url(SHEET_URL).sheet1
+
+
+def _finish_frame(df, fetched_at=None):
+    # infer ทีละคอลัมน์ ให้ชนิดออกมาเหมือน pd.DataFrame(records) (infer ทั้งบล็อก object ไม่ตรง)
+    df = pd.DataFrame({col: df[col].infer_objects() for col in df.columns}, index=df.index)
+    # get_all_records ให้ตัวเลขปนกับ "" ในคอลัมน์เดียวกัน Arrow เก็บแบบนั้นไม่ได้
+    # จึงแปลงคอลัมน์ที่ชนิดปนกันเป็น str ทั้งตอนโหลดจากเน็ตและจาก snapshot ให้เหมือนกัน
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=False) != "string":
+            df[col] = df[col].astype(str)
+    df.attrs["fetched_at"] = time.time() if fetched_at is None else fetched_at
+    return df
+
+
+def records_to_frame(raw_data, fetched_at=None):
+    return _finish_frame(pd.DataFrame(raw_data), fetched_at)
+
+
+# ==================== NORMALIZE ====================
+# ค่าที่หมายถึง "ไม่มีผล" (เทียบแบบตัวพิมพ์เล็ก) กลายเป็น NaN โดยไม่นับว่าแปลงไม่ได้
+MISSING_TOKENS = {"", "-", "n/a", "na", "nan", "none", "null"}
+QUALITY_EXAMPLES = 5
+
+
+def coerce_numeric(series):
+    # คืน (float64 ว่าง = NaN, mask ของเซลล์ที่มีค่าแต่แปลงเป็นตัวเลขไม่ได้) ตัด , หลักพันออกก่อน
+    text = series.astype(str).str.replace(",", "", regex=False).str.strip()
+    values = pd.to_numeric(text, errors="coerce").astype("float64")
+    bad = values.isna() & ~text.str.lower().isin(MISSING_TOKENS)
+    return values, bad.to_numpy()
+
+
+def prepare_frame(df):
+    # ทำครั้งเดียวหลังโหลด: หัวคอลัมน์ strip, คอลัมน์ค้นหาเป็น str, ผลแล็บเป็น float (ว่าง = NaN)
+    # ผลลัพธ์ถูกแชร์ทุก session ห้ามแก้ไขในที่
+    # attrs["quality"]: คอลัมน์ -> {"bad": จำนวนเซลล์ที่แปลงไม่ได้, "examples": ตัวอย่างค่าดิบ}
+    fetched_at = df.attrs.get("fetched_at")
+    df = df.rename(columns=lambda c: str(c).strip())
+    for col in id_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    quality = {}
+    for col in df.columns:
+        if is_lab_column(col):
+            values, bad = coerce_numeric(df[col])
+            if bad.any():
+                raw = df[col][bad].astype(str).str.strip()
+                quality[col] = {"bad": int(bad.sum()), "examples": raw.unique()[:QUALITY_EXAMPLES].tolist()}
+            df[col] = values
+    df.attrs["fetched_at"] = fetched_at
+    df.attrs["quality"] = quality
+    return df
+
+
+# ==================== DTYPES ====================
+# ข้อความที่ซ้ำมาก (เพศ หน่วยงาน ผลปัสสาวะ Color68 CXR/EKG ...) -> category, ตัวเลข -> ชนิดเล็กสุดที่ค่าไม่เปลี่ยน
+# คอลัมน์ค้นหา (เลขบัตร HN ชื่อ) แทบไม่ซ้ำ คงเป็น str
+CATEGORY_MAX_RATIO = 0.5  # ค่าไม่ซ้ำไม่เกินครึ่งหนึ่งของจำนวนแถว
+_FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+
+def _downcast(values):
+    # คืนอาร์เรย์ชนิดที่เล็กกว่าเมื่อค่าทุกตัวเท่าเดิมทุกบิต (None = คงเดิม)
+    if values.dtype.kind in "iu":
+        smaller = pd.to_numeric(values, downcast="integer")
+        return smaller if smaller.dtype.itemsize < values.dtype.itemsize else None
+    if values.dtype != np.float64:
+        return None
+    finite = values[np.isfinite(values)]
+    if np.abs(finite).max(initial=0) > _FLOAT32_MAX:
+        return None
+    # ค่าอย่าง 5.1 เป็น float32 แล้วกลับมาเป็น 5.099999904... (รายงานแสดงต่างจากชีต) จึงลดเฉพาะค่าที่แทนได้พอดี
+    # เช่น จำนวนเต็ม (FBS ความดัน คอเลสเตอรอล) หรือ .5 .25
+    smaller = values.astype(np.float32)
+    same = np.array_equal(smaller.astype(np.float64), values, equal_nan=True)
+    return smaller if same else None
+
+
+def optimize_dtypes(df):
+    # ทำครั้งเดียวหลัง prepare_frame คืน frame ใหม่ (ไม่แก้ df เดิม)
+    # attrs["memory"]: ขนาดก่อน/หลัง (bytes, deep) และจำนวนคอลัมน์ที่เปลี่ยนชนิด
+    before = int(df.memory_usage(deep=True).sum())
+    df = df.copy(deep=False)
+    categorical = downcast = 0
+    for col in df.columns:
+        series = df[col]
+        if col in id_columns or len(series) == 0:
+            continue
+        if pd.api.types.is_string_dtype(series.dtype) or series.dtype == object:
+            if series.nunique(dropna=False) <= len(series) * CATEGORY_MAX_RATIO:
+                df[col] = series.astype("category")
+                categorical += 1
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            smaller = _downcast(series.to_numpy())
+            if smaller is not None:
+                df[col] = pd.Series(smaller, index=df.index, name=col)
+                downcast += 1
+    df.attrs["memory"] = {
+        "before_bytes": before,
+        "after_bytes": int(df.memory_usage(deep=True).sum()),
+        "categorical_columns": categorical,
+        "downcast_columns": downcast,
+    }
+    return df
+
+
+def quality_report(df):
+    # ตารางคุณภาพข้อมูลสำหรับหน้าผู้ดูแล เรียงคอลัมน์ที่แปลงไม่ได้มากสุดก่อน
+    quality = df.attrs.get("quality", {})
+    rows = [
+        {"คอลัมน์": col, "แปลงไม่ได้": item["bad"], "ตัวอย่างค่า": ", ".join(item["examples"])}
+        for col, item in quality.items()
+    ]
+    report = pd.DataFrame(rows, columns=["คอลัมน์", "แปลงไม่ได้", "ตัวอย่างค่า"])
+    return report.sort_values("แปลงไม่ได้", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def display_value(value):
+    # ค่าที่แปลงชนิดแล้ว -> ค่าแบบที่ get_all_records ให้ (NaN = "", จำนวนเต็มเป็น int)
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# ==================== PERSON RECORD ====================
+# ข้อมูลส่วนตัวของคนที่เลือก แปลงครั้งเดียวตอนเลือก: ข้อความ strip แล้ว อ่านเป็น attribute
+# แทน Series ทั้งแถว (หลายร้อยคอลัมน์) ที่เคยเก็บใน session และ .get ทีละคอลัมน์ทุก rerun
+# ค่าตามปี (แล็บ/สัญญาณชีพ) อ่านจาก MetricStore ผ่าน report.year_values อยู่แล้ว
+# ช่อง -> (คอลัมน์, ค่าเมื่อชีตไม่มีคอลัมน์นี้)
+PERSON_FIELDS = {
+    "id_card": ("เลขบัตรประชาชน", ""),
+    "hn": ("HN", "-"),
+    "name": ("ชื่อ-สกุล", "-"),
+    "age": ("อายุ", "-"),
+    "sex": ("เพศ", "-"),
+    "department": ("หน่วยงาน", "-"),
+    "exam_date": ("วันที่ตรวจ", "-"),
+    "hbsag": ("HbsAg", "N/A"),
+    "hbsab": ("HbsAb", "N/A"),
+    "hbcab": ("HBcAB", "N/A"),
+}
+
+
+class PersonRecord:
+    __slots__ = tuple(PERSON_FIELDS)
+
+    @classmethod
+    def from_frame(cls, df, row):
+        # row = ตำแหน่งแถว อ่านเฉพาะคอลัมน์ข้อมูลส่วนตัว ไม่สร้างทั้งแถว
+        record = cls.__new__(cls)
+        for attr, (col, default) in PERSON_FIELDS.items():
+            value = display_value(df[col].iat[row]) if col in df.columns else default
+            setattr(record, attr, str(value).strip())
+        return record
+
+    def key(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, PersonRecord) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"PersonRecord(hn={self.hn!r}, name={self.name!r})"
+
+
+# ==================== INCREMENTAL SYNC ====================
+# "full" = get_all_records ทุกครั้งแบบเดิม, "incremental" = SheetSync ด้านล่าง
+SYNC_MODE = os.environ.get("SHEET_SYNC_MODE", "incremental")
+SYNC_CHUNK_ROWS = 500
+# "report" = ดึงเฉพาะคอลัมน์ที่รายงานใช้ (schema.is_report_column), "all" = ทุกคอลัมน์
+SYNC_COLUMNS = os.environ.get("SHEET_SYNC_COLUMNS", "report")
+
+
+def _col_letter(index):
+    return rowcol_to_a1(1, index + 1)[:-1]
+
+
+def _row_hash(row):
+    return hashlib.blake2b("\x1f".join(row).encode(), digest_size=8).digest()
+
+
+def _last_update_time(worksheet):
+    try:
+        return worksheet.spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return None  # ไม่มีสิทธิ์ Drive metadata ก็ยังเทียบ hash รายแถวได้
+
+
+class SheetSync:
+    # เก็บ hash ของทุกแถวจากรอบก่อน รอบถัดไป parse (numericise) และสร้างเฉพาะแถวที่
+    # hash ใหม่ แถวที่ hash เดิมหายไปถือว่าถูกลบ/แก้ไข ถ้าไฟล์ไม่ถูกแก้เลย
+    # (modifiedTime เท่าเดิม) จะไม่ดาวน์โหลดค่าในชีตเลย
+    def __init__(self, chunk_rows=SYNC_CHUNK_ROWS, select=None):
+        self.chunk_rows = chunk_rows
+        self.select = select  # ฟังก์ชัน ชื่อหัวคอลัมน์ -> ต้องดึงไหม, None = ทุกคอลัมน์
+        self.modified = None
+        self.sheet_headers = None  # หัวตารางเต็มของชีต ใช้วางแผนช่วงคอลัมน์รอบถัดไป
+        self.headers = None
+        self.row_hashes = []
+        self.raw = None  # ค่าหลัง numericise (object) ก่อนแปลงชนิดคอลัมน์
+        self.df = None
+        self.last_stats = {}
+
+    def _column_runs(self, sheet_headers, n_cols):
+        # ช่วงคอลัมน์ที่ติดกัน [c0, c1) ที่ต้องดึง
+        if self.select is None:
+            return [(0, n_cols)]
+        runs = []
+        for i, header in enumerate(sheet_headers):
+            if not self.select(header):
+                continue
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+        return runs
+
+    def _fetch_rows(self, worksheet):
+        n_rows = worksheet.row_count
+        starts = list(range(2, n_rows + 1, self.chunk_rows))
+        sheet_headers = self.sheet_headers
+        if sheet_headers is None and self.select is not None:
+            # รอบแรกยังไม่รู้ว่าคอลัมน์ที่ต้องใช้อยู่ตรงไหน ต้องขอหัวตารางก่อนหนึ่งครั้ง
+            sheet_headers = worksheet.batch_get(["1:1"])[0][:1]
+            sheet_headers = list(sheet_headers[0]) if sheet_headers else []
+
+        # หัวตาราง + ทุกช่วงคอลัมน์ x ทุกช่วงแถว ในคำขอเดียว ถ้าหัวตารางเปลี่ยนจากที่ใช้วางแผน
+        # (เช่นแทรกคอลัมน์) ก็วางแผนใหม่แล้วขออีกครั้ง
+        while True:
+            runs = self._column_runs(sheet_headers or [], worksheet.col_count)
+            ranges = ["1:1"] + [
+                f"{_col_letter(c0)}{start}:{_col_letter(c1 - 1)}{min(start + self.chunk_rows - 1, n_rows)}"
+                for start in starts
+                for c0, c1 in runs
+            ]
+            chunks = worksheet.batch_get(ranges)
+            header_row = list(chunks[0][0]) if chunks[0] else []
+            if self.select is None or header_row == sheet_headers:
+                break
+            sheet_headers = header_row
+        self.sheet_headers = header_row
+        if not header_row:
+            return []
+
+        header_row = header_row + [""] * (max((c1 for _, c1 in runs), default=0) - len(header_row))
+        rows = [[cell for c0, c1 in runs for cell in header_row[c0:c1]]]
+        chunks = iter(chunks[1:])
+        for start in starts:
+            expected = min(start + self.chunk_rows - 1, n_rows) - start + 1
+            block = [[] for _ in range(expected)]
+            for c0, c1 in runs:
+                # API ตัดแถวว่าง/เซลล์ว่างท้ายแต่ละช่วงทิ้ง เติมกลับให้ตำแหน่งตรงกับชีต
+                for row, cells in zip(block, list(next(chunks)) + [[]] * expected):
+                    row.extend(cells)
+                    row.extend([""] * (c1 - c0 - len(cells)))
+            rows.extend(block)
+
+        # ตัดเซลล์ว่างท้ายแล้ว pad ให้กว้างเท่ากันเหมือน worksheet.get(pad_values=True)
+        for row in rows:
+            while row and row[-1] == "":
+                row.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        width = max((len(row) for row in rows), default=0)
+        for row in rows:
+            row.extend([""] * (width - len(row)))
+        return rows
+
+    def sync(self, worksheet):
+        modified = _last_update_time(worksheet)
+        if self.df is not None and modified is not None and modified == self.modified:
+            self.last_stats = {"added": 0, "removed": 0, "kept": len(self.df), "downloaded": False}
+            return self.df
+
+        rows = self._fetch_rows(worksheet)
+        if not rows:
+            headers, values = [], []
+        else:
+            headers, values = rows[0], rows[1:]
+        # ตรวจหัวตารางทั้งแผ่นเหมือน get_all_records ไม่ใช่แค่คอลัมน์ที่ดึงมา
+        duplicates = [h for h, count in Counter(self.sheet_headers or []).items() if count > 1]
+        if duplicates:
+            raise gspread.exceptions.GSpreadException(
+                f"the header row in the worksheet contains duplicates: {duplicates}"
+            )
+
+        hashes = [_row_hash(row) for row in values]
+        # ถ้าหัวคอลัมน์เปลี่ยน (เช่นเพิ่มคอลัมน์ปีใหม่) ต้องสร้างใหม่ทั้งหมด
+        reuse = self.raw is not None and headers == self.headers
+        old_rows = defaultdict(deque)
+        if reuse:
+            for pos, h in enumerate(self.row_hashes):
+                old_rows[h].append(pos)
+        n_old = len(self.raw) if reuse else 0
+
+        order = np.empty(len(values), dtype=np.intp)
+        new_rows = []
+        for i, h in enumerate(hashes):
+            bucket = old_rows.get(h)
+            if bucket:
+                order[i] = bucket.popleft()
+            else:
+                order[i] = n_old + len(new_rows)
+                new_rows.append(numericise_all(values[i], False, "", False, []))
+        kept = len(values) - len(new_rows)
+        self.last_stats = {"added": len(new_rows), "removed": n_old - kept, "kept": kept, "downloaded": True, "columns": len(headers)}
+
+        if not values:
+            df = records_to_frame([])
+            self.raw = None
+            self.df = df
+        elif reuse and not new_rows and kept == n_old and np.array_equal(order, np.arange(n_old)):
+            df = self.df
+        else:
+            new_raw = pd.DataFrame(new_rows, columns=headers, dtype=object)
+            raw = pd.concat([self.raw, new_raw], ignore_index=True) if reuse else new_raw
+            raw = raw.take(order).reset_index(drop=True)
+            df = _finish_frame(raw)
+            self.raw = raw
+            self.df = df
+
+        self.modified = modified
+        self.headers = headers
+        self.row_hashes = hashes
+        return df
+
+
+_sync = SheetSync(select=is_report_column if SYNC_COLUMNS == "report" else None)
+
+
+def fetch_sheet(service_account_info):
+    worksheet = open_worksheet(service_account_info)
+    if SYNC_MODE == "full":
+        return records_to_frame(worksheet.get_all_records())
+    return _sync.sync(worksheet)
+
+
+def write_snapshot(df, path=SNAPSHOT_PATH):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"snapshot_schema_version"] = str(SNAPSHOT_SCHEMA_VERSION).encode()
+    metadata[b"fetched_at"] = repr(df.attrs["fetched_at"]).encode()
+    # ขนาดของ DataFrame แบบปกติ (สำเนาส่วนตัว) ไว้รายงานว่าการ map ไฟล์ประหยัดไปเท่าไร
+    metadata[b"frame_bytes"] = str(int(df.memory_usage(deep=True).sum())).encode()
+    metadata[b"quality"] = json.dumps(df.attrs.get("quality", {}), ensure_ascii=False).encode()
+    metadata[b"memory"] = json.dumps(df.attrs.get("memory", {})).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # เขียนไฟล์ชั่วคราวแล้ว os.replace ทับ โปรเซสอื่นที่ map ไฟล์เก่าอยู่ยังอ่านต่อได้
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    # คอลัมน์เป็น ArrowDtype ที่ชี้เข้า buffer ของไฟล์ที่ map ไว้โดยตรง (zero-copy)
+    # ทุก session และทุกโปรเซสที่เปิดไฟล์เดียวกันใช้หน้าหน่วยความจำชุดเดียวกันจาก page cache
+    # ไฟล์ไม่มี/อ่านไม่ได้/ไม่สมบูรณ์ (เช่น writer บนเครื่องอื่นที่แชร์ path ล่มกลางทาง) = ไม่มี snapshot
+    # ผู้เรียกจะดึงจาก Google แทนแบบเดียวกับ schema version ไม่ตรง
+    try:
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(b"snapshot_schema_version") != str(SNAPSHOT_SCHEMA_VERSION).encode():
+        return None
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    df.attrs["fetched_at"] = float(metadata[b"fetched_at"])
+    df.attrs["frame_bytes"] = int(metadata.get(b"frame_bytes", 0))
+    df.attrs["quality"] = json.loads(metadata.get(b"quality", b"{}"))
+    df.attrs["memory"] = json.loads(metadata.get(b"memory", b"{}"))
+    df.attrs["mapped_bytes"] = source.size()
+    return df
+
+
+def _snapshot_age(path=SNAPSHOT_PATH):
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _rss_bytes():
+    # Linux เท่านั้น: RssFile คือหน้าที่ map จากไฟล์ (แชร์ข้ามโปรเซสได้), RssAnon คือหน่วยความจำส่วนตัว
+    try:
+        with open("/proc/self/status") as f:
+            lines = [line.split(":") for line in f if line.startswith(("VmRSS", "RssAnon", "RssFile"))]
+    except OSError:
+        return {}
+    return {key: int(value.split()[0]) * 1024 for key, value in lines}
+
+
+def memory_report(df, store=None):
+    # store = MetricStore ของ df (อาร์เรย์ของมันอยู่ในหน่วยความจำส่วนตัวของโปรเซส ไม่ได้ map จากไฟล์)
+    frame_bytes = df.attrs.get("frame_bytes", 0)
+    return {
+        "mapped_bytes": df.attrs.get("mapped_bytes", 0),
+        # cache_data เดิมให้สำเนานี้กับทุก rerun ของทุก session ตอนนี้ทุกคนอ่านไฟล์เดียวกัน
+        "saved_per_session_bytes": frame_bytes,
+        # optimize_dtypes: ขนาด DataFrame ก่อน/หลังเปลี่ยนเป็น category และลดชนิดตัวเลข
+        "dtypes": df.attrs.get("memory", {}),
+        "metric_store_bytes": store.nbytes if store is not None else 0,
+        "process": _rss_bytes(),
+    }
+
+
+_first_load = True
+_snapshot_fetched_at = None
+
+
+def load_sheet(service_account_info):
+    global _first_load, _snapshot_fetched_at
+    # ครั้งแรกของโปรเซส: ใช้ snapshot ที่ไม่เก่าเกิน SNAPSHOT_MAX_AGE ได้เลย
+    # ครั้งต่อไป: ถ้าโปรเซสอื่นเพิ่งรีเฟรชไฟล์ภายใน TTL ก็ map ไฟล์นั้นแทนการดึงจาก Google ซ้ำ
+    # attrs["checked_at"]: เวลาที่ตรวจกับชีตล่าสุด (mtime ของ snapshot ถูก utime ทุกครั้งที่ตรวจแล้วไม่เปลี่ยน)
+    # ต่างจาก fetched_at ที่เป็นเวลาที่ข้อมูลเปลี่ยนล่าสุด
+    max_age = SNAPSHOT_MAX_AGE if _first_load else SHEET_TTL
+    _first_load = False
+    age = _snapshot_age()
+    if age is not None and age < max_age:
+        with stage("snapshot_read"):
+            df = read_snapshot()
+        if df is not None:
+            df.attrs["checked_at"] = time.time() - age
+            return df
+
+    checked_at = time.time()
+    with stage("fetch"):
+        raw = fetch_sheet(service_account_info)
+    with stage("normalize"):
+        df = prepare_frame(raw)
+    with stage("optimize_dtypes"):
+        df = optimize_dtypes(df)
+    df.attrs["checked_at"] = checked_at
+    if df.empty:
+        return df
+    try:
+        if df.attrs["fetched_at"] != _snapshot_fetched_at:
+            with stage("snapshot_write"):
+                write_snapshot(df)
+            _snapshot_fetched_at = df.attrs["fetched_at"]
+        else:
+            # sync แล้วข้อมูลไม่เปลี่ยน: แค่อัปเดตเวลาไฟล์ให้โปรเซสอื่นรู้ว่าเพิ่งตรวจ
+            os.utime(SNAPSHOT_PATH)
+    except OSError:
+        return df  # ดิสก์เขียนไม่ได้ก็ยังเสิร์ฟข้อมูลจากเน็ตได้ตามปกติ (ไม่แชร์)
+    with stage("snapshot_read"):
+        mapped = read_snapshot()
+    if mapped is None:
+        return df
+    mapped.attrs["checked_at"] = checked_at
+    return mapped
+
+
+# ==================== BACKGROUND REFRESH ====================
+def _validate(df):
+    # ข้อมูลใหม่ต้องผ่านก่อนจะแทนชุดเดิม ไม่งั้นเสิร์ฟชุดเดิมต่อ
+    missing = [col for col in id_columns if col not in df.columns]
+    if df.empty or missing:
+        raise ValueError(f"ข้อมูลชีตใหม่ไม่สมบูรณ์ (แถว {len(df)}, ไม่มีคอลัมน์ {missing})")
+
+
+class SheetRefresher:
+    # stale-while-revalidate: หมด TTL แล้วยังคืนข้อมูลชุดเดิมทันที แล้วให้ thread เดียว
+    # ดึงชุดใหม่เบื้องหลัง session ที่เข้ามาระหว่างนั้นไม่สร้าง fetch ซ้ำ
+    def __init__(self, ttl=SHEET_TTL):
+        self.ttl = ttl
+        self.df = None
+        self.loaded_at = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get(self, service_account_info):
+        with self._lock:
+            if self.df is None:
+                # ยังไม่มีข้อมูลเลยต้องรอ session ที่เข้ามาพร้อมกันรอ lock เดียวกันแล้วใช้ผลเดียวกัน
+                df = load_sheet(service_account_info)
+                if df.empty:
+                    return df
+                # snapshot ตอน cold start อาจเก่าได้ถึง SNAPSHOT_MAX_AGE: นับอายุจากเวลาที่ตรวจจริง
+                # ไม่ใช่เวลาที่โหลด ข้อมูลเก่าจึงถูกรีเฟรชเบื้องหลังตั้งแต่ request ถัดไป
+                self.df, self.loaded_at = df, df.attrs["checked_at"]
+            elif self._should_refresh():
+                self._thread = threading.Thread(
+                    target=self._refresh, args=(service_account_info,), name="sheet-refresh", daemon=True
+                )
+                self._thread.start()
+            return self.df
+
+    def _should_refresh(self):
+        now = time.time()
+        return self._thread is None and now - self.loaded_at >= self.ttl and now >= self.retry_at
+
+    def _refresh(self, service_account_info):
+        try:
+            df = load_sheet(service_account_info)
+            _validate(df)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.retry_at = time.time() + min(REFRESH_BACKOFF_BASE * 2 ** (self.failures - 1), REFRESH_BACKOFF_MAX)
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._thread = None
+        else:
+            with self._lock:
+                self.df, self.loaded_at = df, df.attrs["checked_at"]
+                self.failures, self.retry_at, self.last_error = 0, 0.0, None
+                self._thread = None
+
+    def status(self):
+        with self._lock:
+            return {
+                "age_seconds": time.time() - self.loaded_at if self.df is not None else None,
+                "refreshing": self._thread is not None,
+                "failures": self.failures,
+                "retry_in_seconds": max(self.retry_at - time.time(), 0.0),
+                "last_error": self.last_error,
+            }
+
+
+_refresher = SheetRefresher()
+
+
+def get_sheet(service_account_info):
+    return _refresher.get(service_account_info)
+
+
+def refresh_status():
+    return _refresher.status()
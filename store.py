@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from schema import (
+    blood_columns_by_year,
+    cbc_columns_by_year,
+    columns_by_year,
+    exam_columns_by_year,
+    lab_metrics,
+    metric_by_base,
+    split_year,
+)
+from sheet import display_value
+
+# ==================== METRIC STORE ====================
+# สร้างครั้งเดียวตอนโหลดชีต: คอลัมน์แบบกว้าง (FBS61 ... FBS68, น้ำหนัก61 ... น้ำหนัก)
+# -> อาร์เรย์ [แถว, ตัวชี้วัด, ปี] ตัวเลขเป็น float (ว่าง = NaN) ข้อความแบบ display_value (ว่าง = "")
+# ค่าที่อ่านออกเป็น float64/ค่าข้อความเสมอ ไม่ว่าข้างในจะเก็บแบบไหน
+# ปีหาจากเลขท้ายชื่อคอลัมน์ ปีใหม่ (69, 70, ...) จึงไม่ต้องแก้โค้ด
+
+# คอลัมน์ไม่มีเลขปีที่ schema ระบุปีไว้ เช่น "MCHC" -> 68
+_schema_year = {
+    col: year
+    for mapping in (columns_by_year, blood_columns_by_year, cbc_columns_by_year, exam_columns_by_year)
+    for year, cols in mapping.items()
+    for col in cols.values()
+    if split_year(col)[1] is None
+}
+
+def discover_columns(columns):
+    # คืน {(ตัวชี้วัด, ปี): ชื่อคอลัมน์}
+    # เฉพาะคอลัมน์ที่ชื่อฐานอยู่ใน schema: คอลัมน์อื่นที่ลงท้ายด้วยเลข (เบอร์โทร ห้อง ...) ไม่ใช่ปี
+    suffixed, plain = {}, []
+    for col in columns:
+        base, year = split_year(col)
+        if base not in metric_by_base:
+            continue  # ข้อมูลส่วนตัว เช่น HN, เพศ หรือคอลัมน์ที่รายงานไม่ใช้
+        if year is None:
+            plain.append(col)
+        else:
+            suffixed[(metric_by_base[base], year)] = col
+    found = dict(suffixed)
+    if not suffixed:
+        return found
+
+    # คอลัมน์ไม่มีเลขปี = ปีตาม schema ("น้ำหนัก", "CXR", "MCHC" -> 68) ถ้ายังไม่มีคอลัมน์มีเลขของปีนั้น
+    # ไม่รู้ปีจาก schema (หรือปีนั้นมีคอลัมน์มีเลขแล้ว) = ปีถัดจากปีล่าสุดของตัวชี้วัดเดียวกัน หรือปีล่าสุดของชีต
+    latest = max(year for _, year in suffixed)
+    for col in plain:
+        metric = metric_by_base[col]
+        seen = [year for m, year in suffixed if m == metric]
+        schema_year = _schema_year.get(col)
+        if schema_year is not None and (metric, schema_year) not in suffixed:
+            year = schema_year  # "น้ำหนัก" คือปี 68 เสมอ แม้ชีตจะเพิ่ม "น้ำหนัก69" แล้ว
+        elif seen:
+            year = max(seen) + 1
+        else:
+            year = latest
+        found[(metric, year)] = col
+    return found
+
+
+def _number_values(s, dtype=float):
+    if pd.api.types.is_numeric_dtype(s):
+        return s.to_numpy(dtype=dtype, na_value=np.nan)
+    text = s.astype(str).str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(text, errors="coerce").to_numpy(dtype=dtype, na_value=np.nan)
+
+
+def _fits_float32(s):
+    # คอลัมน์ที่ sheet.optimize_dtypes ลดเป็น float32/จำนวนเต็มเล็กได้พอดี (ค่าทุกตัวแทนด้วย float32 ได้ตรงบิต)
+    dtype = np.dtype(getattr(s.dtype, "numpy_dtype", s.dtype))
+    return dtype == np.float32 or (dtype.kind in "iu" and dtype.itemsize <= 2)
+
+
+class MetricStore:
+    # ตัวเลข: ตัวชี้วัดที่ทุกคอลัมน์เป็น float32 พอดีเก็บใน float32 ที่เหลือ float64 (ค่าไม่เปลี่ยนเมื่ออ่านกลับ)
+    # ข้อความ: รหัสต่อเซลล์ชี้เข้าค่าไม่ซ้ำชุดเดียวกันทุกตัวชี้วัด แทน pointer ของ object ต่อเซลล์
+    def __init__(self, df):
+        self.size = len(df)
+        found = discover_columns(df.columns)
+        self.years = sorted({year for _, year in found})
+        self._year_pos = {year: i for i, year in enumerate(self.years)}
+        self._columns = found
+
+        by_metric = {}
+        for (metric, year), col in found.items():
+            by_metric.setdefault(metric, []).append((year, col))
+        # ตัวชี้วัดแล็บ/สัญญาณชีพเป็นตัวเลขเสมอ อื่น ๆ เป็นตัวเลขเมื่อทุกปีเป็นตัวเลขจริง
+        numeric = sorted(
+            m for m, cols in by_metric.items()
+            if m in lab_metrics or all(pd.api.types.is_numeric_dtype(df[c]) for _, c in cols)
+        )
+        text = sorted(set(by_metric) - set(numeric))
+        narrow = [m for m in numeric if all(_fits_float32(df[c]) for _, c in by_metric[m])]
+        wide = [m for m in numeric if m not in narrow]
+        self.number_metrics = narrow + wide  # ลำดับตรงกับแกนตัวชี้วัดของ numbers_of()
+
+        self._number_arrays = []
+        self._metric_pos = {}
+        for metrics, dtype in ((narrow, np.float32), (wide, np.float64)):
+            array = np.full((self.size, len(metrics), len(self.years)), np.nan, dtype=dtype)
+            self._number_arrays.append(array)
+            for m, metric in enumerate(metrics):
+                self._metric_pos[metric] = (array, m)
+                for year, col in by_metric[metric]:
+                    array[:, m, self._year_pos[year]] = _number_values(df[col], dtype)
+
+        values, code_of = [""], {"": 0}  # รหัส 0 = ว่าง (รวมปีที่ไม่มีคอลัมน์)
+        codes = np.zeros((self.size, len(text), len(self.years)), dtype=np.int32)
+        for m, metric in enumerate(text):
+            for year, col in by_metric[metric]:
+                local, uniques = pd.factorize(pd.Series([display_value(v) for v in df[col].tolist()], dtype=object))
+                for value in uniques:
+                    if value not in code_of:
+                        code_of[value] = len(values)
+                        values.append(value)
+                mapping = np.array([code_of[value] for value in uniques], dtype=np.int32)
+                codes[:, m, self._year_pos[year]] = mapping[local]
+        self._text_values = np.array(values, dtype=object)
+        self._texts = codes.astype(np.min_scalar_type(len(values)))
+        for m, metric in enumerate(text):
+            self._metric_pos[metric] = (self._texts, m)
+
+    @property
+    def metrics(self):
+        return list(self._metric_pos)
+
+    @property
+    def nbytes(self):
+        # หน่วยความจำของอาร์เรย์ทั้งหมด (อยู่ตลอดอายุโปรเซส แยกจาก DataFrame)
+        return sum(a.nbytes for a in self._number_arrays) + self._texts.nbytes + self._text_values.nbytes
+
+    def _is_text(self, array):
+        return array is self._texts
+
+    def value(self, row, metric, year):
+        # ไม่มีคอลัมน์ของปีนั้น = ค่าว่างแบบเดียวกับเซลล์ว่าง
+        if metric not in self._metric_pos:
+            return np.nan
+        array, m = self._metric_pos[metric]
+        if year not in self._year_pos:
+            return "" if self._is_text(array) else np.nan
+        value = array[row, m, self._year_pos[year]]
+        return self._text_values[value] if self._is_text(array) else np.float64(value)
+
+    def history(self, row, metric):
+        # ค่าทุกปีของคนเดียว เรียงตาม self.years
+        array, m = self._metric_pos[metric]
+        values = array[row, m, :]
+        return self._text_values[values] if self._is_text(array) else values.astype(np.float64)
+
+    def numbers_of(self, row):
+        # ค่าตัวเลขทุกตัวชี้วัดทุกปีของคนเดียวในครั้งเดียว [ตัวชี้วัด (number_metrics), ปี]
+        return np.concatenate([array[row].astype(np.float64) for array in self._number_arrays])
+
+    def cohort(self, metric, year):
+        # ค่าของทุกคนในปีเดียว เรียงตามแถวของ df
+        array, m = self._metric_pos[metric]
+        values = array[:, m, self._year_pos[year]]
+        return self._text_values[values] if self._is_text(array) else values.astype(np.float64)
+
+    def has_results(self, year):
+        # แถวที่มีค่าตัวเลขอย่างน้อยหนึ่งค่าในปีนั้น (มาตรวจปีนั้น)
+        y = self._year_pos[year]
+        found = np.zeros(self.size, dtype=bool)
+        for array in self._number_arrays:
+            if array.shape[1]:
+                found |= ~np.isnan(array[:, :, y]).all(axis=1)
+        return found
+
+    def columns(self, year):
+        # {ตัวชี้วัด: ชื่อคอลัมน์} ของปีนั้น สำหรับโค้ดที่ยังอ่านจากแถวของ df
+        return {metric: col for (metric, y), col in self._columns.items() if y == year}
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from schema import (
+    blood_columns_by_year,
+    cbc_columns_by_year,
+    columns_by_year,
+    exam_columns_by_year,
+    hepatitis_b_columns,
+    years,
+)
+
+# ==================== SYNTHETIC COHORT ====================
+# ชีตปลอมหัวคอลัมน์เดียวกับชีตจริง (รวมชื่อปี 68 ที่ไม่มีเลขปี เช่น "น้ำหนัก", "CXR", "MCHC")
+# ทุกเซลล์เป็นข้อความแบบที่ Sheets แสดง (ว่าง = "") ใช้กับ fake_sheet.FakeWorksheet หรือ records_to_frame ได้เลย
+# สร้างทีละคอลัมน์ด้วย numpy/Arrow ทำได้ถึงหลักล้านแถว (ข้อจำกัดคือหน่วยความจำ ~2-3 GB ต่อล้านแถว)
+
+ATTEND_RATE = 0.8  # โอกาสที่คนหนึ่งมาตรวจในปีหนึ่ง
+MISSING_RATE = 0.03  # โอกาสที่เซลล์ว่างทั้งที่มาตรวจ
+
+# ตัวชี้วัด -> (ค่าเฉลี่ย, SD, ทศนิยม, ต่ำสุด) ค่าประจำตัวคน + ความแปรปรวนรายปี
+_NUMERIC = {
+    "weight": (62, 12, 1, 35), "height": (160, 8, 0, 135), "waist": (82, 11, 0, 50),
+    "sbp": (125, 17, 0, 80), "dbp": (78, 11, 0, 45), "pulse": (78, 11, 0, 45),
+    "FBS": (98, 18, 0, 60), "Uric": (5.8, 1.5, 1, 1.5), "ALK": (75, 22, 0, 20),
+    "SGOT": (26, 10, 0, 8), "SGPT": (27, 15, 0, 5), "Cholesterol": (205, 38, 0, 100),
+    "TG": (135, 60, 0, 30), "HDL": (52, 12, 0, 20), "LDL": (125, 33, 0, 40),
+    "BUN": (12, 3.5, 1, 4), "Cr": (0.9, 0.2, 2, 0.3), "GFR": (95, 18, 0, 20),
+    "hb": (13.5, 1.5, 1, 7), "hct": (41, 4.5, 0, 22), "wbc": (7200, 1900, -1, 2000),
+    "plt": (270000, 65000, -3, 50000), "ne": (58, 8, 0, 20), "ly": (32, 7, 0, 5),
+    "eo": (3, 2, 0, 0), "mo": (6, 2, 0, 0), "ba": (0.5, 0.5, 0, 0), "rbc": (4.8, 0.5, 2, 2.5),
+    "mcv": (86, 6, 0, 55), "mch": (29, 2.5, 1, 17), "mchc": (33, 1.2, 1, 28),
+    "urine_ph": (6.0, 0.7, 1, 5.0), "urine_spgr": (1.015, 0.006, 3, 1.003),
+}
+# ผู้ชายค่าสูงกว่าค่าเฉลี่ยรวมเท่านี้ ผู้หญิงต่ำกว่าเท่านี้
+_MALE_SHIFT = {"hb": 0.9, "hct": 2.5, "Cr": 0.15, "weight": 6, "height": 6, "waist": 3, "HDL": -4}
+
+# ตัวชี้วัด -> (ตัวเลือก, ความน่าจะเป็น)
+_TEXT = {
+    "urine": (["ปกติ", "พบเม็ดเลือดแดงเล็กน้อย", "พบเม็ดเลือดขาวเล็กน้อย", "พบน้ำตาลในปัสสาวะ"], [0.85, 0.06, 0.06, 0.03]),
+    "stool_exam": (["ปกติ", "พบเม็ดเลือดแดง", "พบเม็ดเลือดขาว"], [0.94, 0.03, 0.03]),
+    "stool_cs": (["ไม่พบเชื้อ", "พบเชื้อ Salmonella"], [0.98, 0.02]),
+    "cxr": (["ปกติ", "ผิดปกติ หัวใจโต", "ผิดปกติ พบฝ้าที่ปอด"], [0.93, 0.04, 0.03]),
+    "ekg": (["ปกติ", "ผิดปกติ Sinus bradycardia", "ผิดปกติ LVH"], [0.92, 0.05, 0.03]),
+    "hep_a": (["Negative", "Positive"], [0.7, 0.3]),
+    "hep_b": (["Negative", "Positive"], [0.9, 0.1]),
+    "urine_color": (["Yellow", "Pale Yellow", "Dark Yellow", "Amber"], [0.6, 0.3, 0.07, 0.03]),
+    "urine_sugar": (["Negative", "trace", "1+", "2+"], [0.93, 0.03, 0.02, 0.02]),
+    "urine_alb": (["Negative", "trace", "1+", "2+"], [0.85, 0.09, 0.04, 0.02]),
+    "urine_rbc": (["0-1", "1-2", "2-3", "3-5", "5-10"], [0.55, 0.2, 0.1, 0.1, 0.05]),
+    "urine_wbc": (["0-1", "1-2", "2-3", "3-5", "5-10", "10-20"], [0.45, 0.2, 0.15, 0.1, 0.07, 0.03]),
+    "urine_sq_epi": (["0-1", "1-2", "2-3", "3-5", "5-10"], [0.4, 0.25, 0.15, 0.15, 0.05]),
+    "urine_other": (["-", "Bacteria few", "Mucous thread"], [0.9, 0.06, 0.04]),
+}
+_HEP_B = (["negative", "positive"], [0.9, 0.1])
+
+DEPARTMENTS = [
+    "ฝ่ายการพยาบาล", "กลุ่มงานเภสัชกรรม", "กลุ่มงานเทคนิคการแพทย์", "กลุ่มงานรังสีวิทยา",
+    "กลุ่มงานบริหารทั่วไป", "กลุ่มงานทันตกรรม", "กลุ่มงานเวชกรรมสังคม", "องค์การบริหารส่วนตำบลหนองหาร",
+    "โรงเรียนสันทรายวิทยาคม", "บริษัท ลำไยทอง จำกัด",
+]
+_FIRST = {
+    "ชาย": ["สมชาย", "สมศักดิ์", "ประเสริฐ", "วีระ", "ธนพล", "อนุชา", "ชัยวัฒน์", "ณัฐพล", "สุริยา", "กิตติ",
+            "ศุภชัย", "ปกรณ์", "วรวุฒิ", "ธีรวัฒน์", "เอกชัย", "พงศกร", "อภิชาติ", "จักรพันธ์", "ภานุวัฒน์", "สุรเชษฐ์"],
+    "หญิง": ["สมหญิง", "สุดา", "มาลี", "วันเพ็ญ", "กนกวรรณ", "พรทิพย์", "ศิริพร", "จิราพร", "อรุณี", "นภัสสร",
+             "ปวีณา", "สุภาพร", "รัตนา", "วิไลวรรณ", "อัญชลี", "ธิดารัตน์", "ชนิดา", "กมลชนก", "เบญจวรรณ", "ศศิธร"],
+}
+_SURNAME_PARTS = ["ใจ", "ดี", "แสง", "ทอง", "คำ", "ศรี", "วงศ์", "สุข", "มั่น", "เจริญ", "กาญจน", "พร",
+                  "สวัสดิ์", "บุญ", "มา", "ปัญญา", "อินทร์", "จันทร์", "แก้ว", "เรือน", "ชัย", "ยืน", "คง", "ธรรม"]
+
+
+def _strings(values, decimals):
+    # ตัวเลข -> ข้อความแบบที่ชีตแสดง ("12", "12.5") ผ่าน Arrow ทั้งคอลัมน์
+    return pc.cast(pa.array(np.round(values, decimals)), pa.string())
+
+
+def _blank(strings, blank):
+    return pc.if_else(pa.array(blank), "", strings)
+
+
+def _choice(rng, n, options, probs):
+    return np.asarray(options, dtype=object)[rng.choice(len(options), size=n, p=probs)]
+
+
+def _profile(rng, n):
+    male = rng.random(n) < 0.45
+    sex = np.where(male, "ชาย", "หญิง").astype(object)
+    first = np.where(
+        male,
+        _choice(rng, n, _FIRST["ชาย"], None),
+        _choice(rng, n, _FIRST["หญิง"], None),
+    )
+    title = np.where(male, "นาย", np.where(rng.random(n) < 0.5, "นาง", "นางสาว"))
+    parts = rng.integers(0, len(_SURNAME_PARTS), size=(n, 3))
+    lengths = rng.integers(2, 4, size=n)
+    surname = [
+        "".join(_SURNAME_PARTS[p] for p in row[:k]) for row, k in zip(parts.tolist(), lengths.tolist())
+    ]
+    names = [f"{t} {f} {s}" for t, f, s in zip(title.tolist(), first.tolist(), surname)]
+    ids = rng.integers(10**11, 10**12, size=n) + (rng.integers(1, 9, size=n) * 10**12)
+    day = rng.integers(1, 29, size=n)
+    month = rng.integers(1, 13, size=n)
+    profile = {
+        "เลขบัตรประชาชน": ids.astype(str),
+        "HN": (np.arange(n) + 100000).astype(str),
+        "ชื่อ-สกุล": np.array(names, dtype=object),
+        "อายุ": rng.integers(20, 61, size=n).astype(str),
+        "เพศ": sex,
+        "หน่วยงาน": _choice(rng, n, DEPARTMENTS, None),
+        "วันที่ตรวจ": np.char.add(np.char.add(np.char.zfill(day.astype(str), 2), "/"),
+                                  np.char.add(np.char.zfill(month.astype(str), 2), "/2568")),
+    }
+    return profile, male
+
+
+def generate(n, seed=0, extra_columns=0):
+    """ชีตสังเคราะห์ n แถว คอลัมน์และชื่อตรงกับชีตจริง ทุกค่าเป็นข้อความ"""
+    rng = np.random.default_rng(seed)
+    profile, male = _profile(rng, n)
+    columns = {col: pd.Series(values, dtype="str") for col, values in profile.items()}
+
+    # ค่าประจำตัวแต่ละคน (ตัวชี้วัดเดียวกันปีต่างกันจึงไม่สุ่มอิสระ)
+    base = {}
+    for metric, (mean, sd, _, _) in _NUMERIC.items():
+        shift = np.where(male, 1, -1) * _MALE_SHIFT.get(metric, 0)
+        base[metric] = rng.normal(mean, sd * 0.9, n) + shift
+
+    for year in years:
+        attended = rng.random(n) < ATTEND_RATE
+        mappings = {**columns_by_year[year], **blood_columns_by_year[year],
+                    **cbc_columns_by_year[year], **exam_columns_by_year[year]}
+        for metric, col in mappings.items():
+            blank = ~attended | (rng.random(n) < MISSING_RATE)
+            if metric in _NUMERIC:
+                mean, sd, decimals, low = _NUMERIC[metric]
+                values = np.maximum(base[metric] + rng.normal(0, sd * 0.4, n), low)
+                strings = _strings(values, decimals)
+            else:
+                strings = pa.array(_choice(rng, n, *_TEXT[metric]), type=pa.string())
+            columns[col] = pd.Series(_blank(strings, blank).to_pandas(), dtype="str")
+
+    for col in hepatitis_b_columns:
+        blank = rng.random(n) < 0.5  # ตรวจไวรัสตับอักเสบบีแค่บางคน
+        columns[col] = pd.Series(np.where(blank, "", _choice(rng, n, *_HEP_B)), dtype="str")
+
+    # คอลัมน์ที่รายงานไม่ใช้ (หมายเหตุ/คอลัมน์ช่วยของเจ้าหน้าที่) ไว้ทดสอบการดึงเฉพาะคอลัมน์
+    for i in range(extra_columns):
+        columns[f"หมายเหตุ {i + 1}"] = pd.Series(np.where(rng.random(n) < 0.9, "", "ตรวจซ้ำ"), dtype="str")
+
+    return pd.DataFrame(columns)
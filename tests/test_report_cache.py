@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from report import ReportCache, prefetch_reports, year_values
+from sheet import PersonRecord, prepare_frame, records_to_frame
+from store import MetricStore
+from synthetic import generate
+
+# ==================== REPORT CACHE ====================
+# key ต้องเปลี่ยนเมื่อเซลล์ใดของคนนั้นเปลี่ยน (ไม่เสิร์ฟรายงานเก่า) และ LRU ต้องไม่เกินความจุ
+
+ROWS = 30
+PREFETCH_TIMEOUT = 30
+
+
+def _load(df):
+    df = prepare_frame(records_to_frame(df.to_dict("records")))
+    return df, MetricStore(df)
+
+
+@pytest.fixture(scope="module")
+def sheet():
+    raw = generate(ROWS, seed=5)
+    df, store = _load(raw)
+    year = max(store.years)
+    row = next(r for r in range(ROWS) if store.has_results(year)[r])
+    return raw, df, store, year, row
+
+
+def _get(cache, df, store, row, year):
+    return cache.get(PersonRecord.from_frame(df, row), year_values(store, row, year), year)
+
+
+def test_same_content_hits(sheet):
+    _, df, store, year, row = sheet
+    cache = ReportCache(maxsize=4)
+    first = _get(cache, df, store, row, year)
+    assert _get(cache, df, store, row, year) is first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+@pytest.mark.parametrize("column, value", [("FBS68", "250"), ("ชื่อ-สกุล", "นาย แก้ไข แล้ว"), ("เพศ", "ไม่ระบุ")])
+def test_changed_cell_invalidates(sheet, column, value):
+    raw, df, store, year, row = sheet
+    cache = ReportCache(maxsize=4)
+    before = _get(cache, df, store, row, year)
+
+    edited = raw.copy()
+    assert edited.at[row, column] != value
+    edited.at[row, column] = value
+    new_df, new_store = _load(edited)
+    after = _get(cache, new_df, new_store, row, year)
+    assert after is not before
+    assert cache.stats()["misses"] == 2
+    # แถวอื่นที่ไม่ถูกแก้ยังใช้รายงานเดิมได้ (ต้องเป็นคนละแถว)
+    other = next(r for r in range(ROWS) if r != row)
+    first = _get(cache, df, store, other, year)
+    assert _get(cache, new_df, new_store, other, year) is first
+
+
+def test_lru_evicts_least_recently_used(sheet):
+    _, df, store, year, _ = sheet
+    cache = ReportCache(maxsize=2)
+    a = _get(cache, df, store, 0, year)
+    _get(cache, df, store, 1, year)
+    assert _get(cache, df, store, 0, year) is a  # 0 ใช้ล่าสุด -> 1 เก่าสุด
+    _get(cache, df, store, 2, year)
+    assert cache.stats()["size"] == 2
+    assert _get(cache, df, store, 0, year) is a
+    misses = cache.stats()["misses"]
+    _get(cache, df, store, 1, year)  # ถูกไล่ออกไปแล้ว
+    assert cache.stats()["misses"] == misses + 1
+    assert cache.stats()["size"] == 2
+
+
+def test_prefetch_fills_every_year(sheet):
+    _, df, store, _, row = sheet
+    cache = ReportCache(maxsize=len(store.years))
+    person = PersonRecord.from_frame(df, row)
+    reports = prefetch_reports(cache, store, person, row)
+    deadline = time.monotonic() + PREFETCH_TIMEOUT
+    while len(reports) < len(store.years) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(reports) == store.years
+    for year in store.years:
+        assert cache.get(person, year_values(store, row, year), year) is reports[year]
+    assert cache.stats()["hits"] == len(store.years)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from rules import (
+    fbs_advice,
+    interpret_bmi,
+    interpret_bp,
+    interpret_cohort,
+    interpret_hb,
+    interpret_plt,
+    interpret_wbc,
+    kidney_summary_gfr_only,
+    summarize_lipids,
+    summarize_liver,
+    uric_acid_advice,
+)
+from schema import blood_columns_by_year, cbc_columns_by_year, columns_by_year, years
+from synthetic import generate
+
+# ==================== COHORT vs SCALAR ====================
+# interpret_cohort ต้องให้ผลตรงกับ scalar rule ทุกเซลล์ (เรียกด้วย str(cell).strip() แบบหน้ารายงานเดิม)
+# แก้เกณฑ์ที่ใดที่หนึ่งแล้วลืมอีกที่ test นี้จะไม่ผ่าน
+
+ROWS = 400
+DIRTY_RATE = 0.15
+# ค่าสกปรกแบบที่พบในชีตจริง + ค่าที่อยู่บนขอบเกณฑ์พอดี
+DIRTY_VALUES = [
+    "", " ", "-", "N/A", "n/a", "nan", "abc", "0", "1,234", "13,000", " 12 ", "7.2", "inf", "1e3",
+    "99.5", "100", "126", "200", "150", "40", "60", "59.9", "12", "13", "140", "90", "120", "80",
+    "4000", "10000", "150000", "500000", "7", "8",
+]
+
+
+def _bmi(weight, height):
+    try:
+        return interpret_bmi(float(weight) / (float(height) / 100) ** 2)
+    except (ValueError, ZeroDivisionError):
+        return "-"
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = generate(ROWS, seed=7)
+    rng = np.random.default_rng(7)
+    for col in df.columns[7:]:  # ข้ามข้อมูลส่วนตัว
+        dirty = rng.random(len(df)) < DIRTY_RATE
+        values = df[col].to_numpy(dtype=object)
+        values[dirty] = rng.choice(DIRTY_VALUES, size=int(dirty.sum()))
+        df[col] = values
+    df["เพศ"] = rng.choice(["ชาย", "หญิง", " หญิง", "", "x"], size=len(df))
+    vitals = columns_by_year[years[-1]]
+    df.loc[0, [vitals["weight"], vitals["height"]]] = "inf"  # BMI = inf/inf = NaN
+    return df
+
+
+def test_cohort_matches_scalar_rules(frame):
+    out = interpret_cohort(frame)
+    cells = {col: [str(v).strip() for v in frame[col]] for col in frame.columns}
+    for y in years:
+        vitals, blood, cbc = columns_by_year[y], blood_columns_by_year[y], cbc_columns_by_year[y]
+        expected = {
+            "bmi": lambda i: _bmi(cells[vitals["weight"]][i], cells[vitals["height"]][i]),
+            "bp": lambda i: interpret_bp(cells[vitals["sbp"]][i], cells[vitals["dbp"]][i]),
+            "hb": lambda i: interpret_hb(cells[cbc["hb"]][i], cells["เพศ"][i]),
+            "wbc": lambda i: interpret_wbc(cells[cbc["wbc"]][i]),
+            "plt": lambda i: interpret_plt(cells[cbc["plt"]][i]),
+            "liver": lambda i: summarize_liver(*(cells[blood[k]][i] for k in ("ALK", "SGOT", "SGPT"))),
+            "lipids": lambda i: summarize_lipids(*(cells[blood[k]][i] for k in ("Cholesterol", "TG", "LDL"))),
+            "gfr": lambda i: kidney_summary_gfr_only(cells[blood["GFR"]][i]),
+            "fbs": lambda i: fbs_advice(cells[blood["FBS"]][i]),
+            "uric": lambda i: uric_acid_advice(cells[blood["Uric"]][i]),
+        }
+        for rule, scalar in expected.items():
+            got = out[(rule, y)].tolist()
+            want = [scalar(i) for i in range(len(frame))]
+            mismatched = [(i, got[i], want[i]) for i in range(len(frame)) if got[i] != want[i]]
+            assert not mismatched, f"{rule} ปี {y}: {mismatched[:5]}"
+
+
+@pytest.mark.parametrize("value", ["nan", "NaN", float("nan"), np.float64("nan")], ids=["str", "str-upper", "float", "numpy"])
+def test_nan_is_missing(value):
+    # NaN ต้องเป็นค่าว่าง ไม่ใช่ "สูง" เพราะเทียบกับเกณฑ์แล้ว False ทุกข้อ
+    assert interpret_wbc(value) == "-"
+    assert interpret_plt(value) == "-"
+    assert interpret_hb(value, "หญิง") == "-"
+    assert interpret_bp(value, 80) == "-"
+    assert summarize_liver(value, 20, 20) == "-"
+    assert fbs_advice(value) == ""
+    assert kidney_summary_gfr_only(value) == ""
+    assert summarize_lipids(value, 100, 100) == ""
+    assert uric_acid_advice(value) == "-"
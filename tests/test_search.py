@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from fake_sheet import FakeWorksheet
+from search import SearchIndex, normalize_name
+from sheet import SheetSync, prepare_frame
+
+# ==================== SEARCH ====================
+# ชีตปลอมเล็ก ๆ ผ่าน SheetSync + prepare_frame แบบเดียวกับตอนโหลดจริง แล้วค้นด้วย SearchIndex
+
+HEADER = ["เลขบัตรประชาชน", "HN", "ชื่อ-สกุล", "หน่วยงาน"]
+PEOPLE = [
+    ["1500100000001", "1001", "นาย สมชาย ใจดี", "ER"],
+    ["1500100000002", "1002", "นางสาว สมหญิง ใจดี", "OPD"],
+    ["1500100000003", "1010", "นาง สมศรี มีสุข", "ER"],
+    ["1500200000004", "2001", "นาย ประเสริฐ ทองคำ", "LAB"],
+    ["1500100000005", "1100", "นาย สมชาย ใจดี", "LAB"],  # ชื่อซ้ำกับแถว 0 คนละคน
+    ["3600100000006", "3001", "Mr. John Smith", "ER"],
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    worksheet = FakeWorksheet([HEADER, *PEOPLE])
+    return SearchIndex(prepare_frame(SheetSync().sync(worksheet)))
+
+
+def test_normalize_name_strips_title_spaces_and_dots():
+    assert normalize_name(" นางสาว สมหญิง  ใจดี ") == "สมหญิงใจดี"
+    assert normalize_name("น.ส.สมหญิง ใจดี") == "สมหญิงใจดี"
+    assert normalize_name("Mr. John Smith") == "johnsmith"
+
+
+def test_find_exact_fields(index):
+    assert index.find(id_card="1500100000003").tolist() == [2]
+    assert index.find(hn=" 2001 ").tolist() == [3]
+    assert index.find(full_name="นาย สมชาย ใจดี").tolist() == [0, 4]
+    assert index.find(hn="9999").tolist() == []
+
+
+def test_find_intersects_every_given_field(index):
+    assert index.find(hn="1100", full_name="นาย สมชาย ใจดี").tolist() == [4]
+    assert index.find(id_card="1500100000001", hn="1002").tolist() == []
+
+
+def test_find_without_fields_returns_every_row(index):
+    assert index.find().tolist() == list(range(len(PEOPLE)))
+
+
+def test_exact_name_scores_two_even_with_another_title(index):
+    results = index.names.search("นางสาวสมชาย ใจดี")  # คำนำหน้าต่าง ชื่อตรง
+    assert [row for row, _ in results[:2]] == [0, 4]
+    assert results[0][1] == 2.0
+    assert all(score < 2.0 for _, score in results[2:])
+
+
+def test_typo_and_partial_names_rank_the_right_person_first(index):
+    assert index.names.search("สมศรี มีสข")[0][0] == 2  # พิมพ์ตกสระ
+    assert index.names.search("ประเสริฐ")[0][0] == 3  # พิมพ์แค่ชื่อ
+    assert index.names.search("john smth")[0][0] == 5
+
+
+def test_unrelated_name_finds_nothing(index):
+    assert index.names.search("วิชัย") == []
+    assert index.candidates(full_name="วิชัย") == []
+
+
+def test_complete_returns_sorted_prefix_matches(index):
+    assert index.complete("HN", "10") == ["1001", "1002", "1010"]
+    assert index.complete("HN", "1", limit=2) == ["1001", "1002"]
+    assert index.complete("เลขบัตรประชาชน", "15002") == ["1500200000004"]
+    assert index.complete("HN", "") == []
+    assert index.complete("HN", "9") == []
+
+
+def test_prefix_rows_filter_by_second_field(index):
+    assert index.prefix_rows(id_card="15001") == [0, 1, 2, 4]
+    assert index.prefix_rows(id_card="15001", hn="10") == [0, 1, 2]
+    assert index.prefix_rows(hn="11") == [4]
+
+
+def test_candidates_prefer_exact_number_then_fall_back_to_prefix(index):
+    assert index.candidates(hn="1001") == [0]  # ตรงทุกตัว ไม่เอา 1010 ที่ขึ้นต้นเหมือนกัน
+    assert index.candidates(hn="10") == [0, 1, 2]  # ไม่มี HN "10" -> ที่ขึ้นต้นด้วย 10
+
+
+def test_candidates_with_number_and_name_rank_by_name(index):
+    # เลขใช้คัด ชื่อใช้เรียง: แถวที่ชื่อไม่ใกล้ยังอยู่ท้ายรายการ
+    rows = index.candidates(id_card="15001", full_name="สมศรี")
+    assert rows[0] == 2 and sorted(rows) == [0, 1, 2, 4]
+    rows = index.candidates(id_card="15001", full_name="สมหญิง")
+    assert rows[0] == 1 and sorted(rows) == [0, 1, 2, 4]
+    # ไม่มีเลขตรงทุกตัว: ใช้แถวที่ขึ้นต้นด้วยเลขแล้วเรียงด้วยชื่อ
+    assert index.candidates(hn="20", full_name="ประเสริฐ") == [3]
+
+
+def test_rank_rows_keeps_every_row(index):
+    rows = np.array([0, 3, 5])
+    assert sorted(index.names.rank_rows("john", rows)) == [0, 3, 5]
+    assert index.names.rank_rows("john", rows)[0] == 5
+    assert index.names.rank_rows("", rows) == [0, 3, 5]
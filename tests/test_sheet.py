@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from schema import id_columns
+from sheet import optimize_dtypes, prepare_frame, read_snapshot, records_to_frame, write_snapshot
+from synthetic import generate
+
+# ==================== NORMALIZE ====================
+
+
+def _frame(df):
+    return prepare_frame(records_to_frame(df.to_dict("records")))
+
+
+def test_lab_columns_of_unknown_year_are_coerced_and_reported():
+    # FBS69 ยังไม่อยู่ใน schema.lab_columns ต้องแปลงและรายงานเหมือน FBS68
+    df = generate(4, seed=1)
+    cells = ["1,234", "abc", "95", "N/A"]
+    df["FBS68"] = cells
+    df["FBS69"] = cells
+    out = _frame(df)
+    for col in ("FBS68", "FBS69"):
+        assert out[col].dtype == np.float64
+        np.testing.assert_array_equal(out[col].to_numpy(), [1234.0, np.nan, 95.0, np.nan])
+        assert out.attrs["quality"][col] == {"bad": 1, "examples": ["abc"]}
+
+
+def test_missing_tokens_are_not_reported():
+    df = generate(5, seed=1)
+    df["FBS68"] = ["", "-", "n/a", " NA ", "null"]
+    out = _frame(df)
+    assert out["FBS68"].isna().all()
+    assert "FBS68" not in out.attrs["quality"]
+    assert pd.api.types.is_string_dtype(out["HN"].dtype)
+
+
+# ==================== DTYPES ====================
+
+
+def _assert_same_values(before, after):
+    assert list(before.columns) == list(after.columns)
+    for col in before.columns:
+        if pd.api.types.is_numeric_dtype(before[col].dtype):
+            np.testing.assert_array_equal(
+                before[col].to_numpy(dtype=np.float64, na_value=np.nan),
+                after[col].to_numpy(dtype=np.float64, na_value=np.nan),
+                err_msg=col,
+            )
+        else:
+            assert before[col].tolist() == after[col].astype(object).tolist(), col
+
+
+def test_optimize_dtypes_keeps_every_value():
+    df = _frame(generate(300, seed=2))
+    snapshot = df.copy()
+    out = optimize_dtypes(df)
+    _assert_same_values(df, out)
+    pd.testing.assert_frame_equal(df, snapshot)  # ไม่แก้ frame เดิม
+    for col in id_columns:
+        assert out[col].dtype == df[col].dtype and pd.api.types.is_string_dtype(out[col].dtype)
+    assert out.attrs["memory"]["after_bytes"] < out.attrs["memory"]["before_bytes"]
+
+
+def test_optimize_dtypes_only_narrows_exact_values():
+    df = _frame(generate(4, seed=2)).copy()  # copy: รวมบล็อกก่อนแทนคอลัมน์
+    df["FBS68"] = [95.0, 126.0, np.nan, 100.0]  # จำนวนเต็ม -> float32
+    df["Uric68"] = [5.1, 6.0, np.nan, 7.25]  # 5.1 ไม่พอดีใน float32 -> คง float64
+    df["Cr68"] = [0.5, 1e39, 1.0, np.inf]  # เกินช่วง float32
+    df["อายุ"] = np.array([35, 41, 58, 60], dtype=np.int64)
+    out = optimize_dtypes(df)
+    assert out["FBS68"].dtype == np.float32
+    assert out["Uric68"].dtype == np.float64
+    assert out["Cr68"].dtype == np.float64
+    assert out["อายุ"].dtype == np.int8
+    _assert_same_values(df, out)
+    assert float(out["Uric68"].iat[0]) == 5.1
+
+
+def test_optimized_snapshot_round_trips(tmp_path):
+    df = optimize_dtypes(_frame(generate(50, seed=3)))
+    path = str(tmp_path / "sheet.arrow")
+    write_snapshot(df, path)
+    _assert_same_values(df, read_snapshot(path))
@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from fake_sheet import FakeWorksheet
+from schema import is_report_column
+from sheet import SheetSync, records_to_frame
+from synthetic import generate
+
+# ==================== SHEET SYNC ====================
+# SheetSync.sync บน FakeWorksheet ต้องได้ frame เดียวกับ records_to_frame(get_all_records()) ทุกรอบ
+# chunk_rows เล็กให้มีหลาย chunk และ chunk สุดท้ายไม่เต็ม
+
+ROWS = 40
+CHUNK_ROWS = 7
+
+
+def expected_frame(worksheet, select=None):
+    df = records_to_frame(worksheet.get_all_records())
+    if select is not None:
+        df = df[[col for col in df.columns if select(col)]]
+    return df
+
+
+def assert_synced(sync, worksheet):
+    got = sync.sync(worksheet)
+    pd.testing.assert_frame_equal(
+        got.reset_index(drop=True), expected_frame(worksheet, sync.select).reset_index(drop=True)
+    )
+    return got
+
+
+@pytest.fixture
+def worksheet():
+    return FakeWorksheet.from_frame(generate(ROWS, seed=3), extra_rows=5)
+
+
+@pytest.fixture(params=[None, is_report_column], ids=["all", "report"])
+def sync(request):
+    return SheetSync(chunk_rows=CHUNK_ROWS, select=request.param)
+
+
+def test_initial_sync(sync, worksheet):
+    assert_synced(sync, worksheet)
+    assert sync.last_stats["added"] == ROWS
+
+
+def test_unchanged_sheet_is_not_downloaded(sync, worksheet):
+    first = assert_synced(sync, worksheet)
+    cells = worksheet.cells_downloaded
+    assert sync.sync(worksheet) is first
+    assert worksheet.cells_downloaded == cells
+    assert sync.last_stats["downloaded"] is False
+
+
+def test_cell_edit(sync, worksheet):
+    assert_synced(sync, worksheet)
+    worksheet.update_cell(5, worksheet.values[0].index("FBS68") + 1, "1,234")
+    assert_synced(sync, worksheet)
+    assert (sync.last_stats["added"], sync.last_stats["removed"]) == (1, 1)
+
+
+def test_insert_and_delete_rows(sync, worksheet):
+    assert_synced(sync, worksheet)
+    worksheet.insert_row(worksheet.values[10], index=3)  # แถวซ้ำ: แถวเดิมใช้ค่าเดิม สำเนาเป็นแถวใหม่
+    assert_synced(sync, worksheet)
+    assert (sync.last_stats["added"], sync.last_stats["removed"]) == (1, 0)
+    worksheet.delete_rows(8, 12)
+    assert_synced(sync, worksheet)
+    assert (sync.last_stats["added"], sync.last_stats["removed"]) == (0, 5)
+
+
+def test_appended_row(sync, worksheet):
+    assert_synced(sync, worksheet)
+    row = list(worksheet.values[1])
+    row[worksheet.values[0].index("HN")] = "999999"
+    worksheet.append_row(row)
+    assert_synced(sync, worksheet)
+    assert sync.last_stats["added"] == 1
+
+
+def test_new_year_column(sync, worksheet):
+    assert_synced(sync, worksheet)
+    worksheet.add_column("FBS69", [str(90 + i) for i in range(ROWS // 2)])
+    got = assert_synced(sync, worksheet)
+    assert "FBS69" in got.columns
+    assert sync.last_stats["added"] == ROWS  # หัวตารางเปลี่ยน: สร้างใหม่ทั้งหมด
+
+
+def test_projection_skips_other_columns(worksheet):
+    worksheet.add_column("หมายเหตุ", ["โทรนัด"] * ROWS)
+    syncs = {"all": SheetSync(chunk_rows=CHUNK_ROWS), "report": SheetSync(chunk_rows=CHUNK_ROWS, select=is_report_column)}
+    for name, sync in syncs.items():
+        df = assert_synced(sync, worksheet)
+        assert ("หมายเหตุ" in df.columns) == (name == "all")
+    # รอบถัดไป (รู้หัวตารางแล้ว) ดาวน์โหลดแค่คอลัมน์ที่เลือก
+    worksheet.update_cell(2, 1, worksheet.values[1][0])
+    downloaded = {}
+    for name, sync in syncs.items():
+        before = worksheet.cells_downloaded
+        sync.sync(worksheet)
+        downloaded[name] = worksheet.cells_downloaded - before
+    assert downloaded["report"] < downloaded["all"] - ROWS
@@ -0,0 +1,30 @@
+from sheet import prepare_frame, records_to_frame
+from store import MetricStore, discover_columns
+from synthetic import generate
+
+
+def test_latest_year_columns_without_suffix():
+    found = discover_columns(["FBS61", "FBS67", "FBS", "CXR62", "CXR", "MCHC"])
+    assert found == {("FBS", 61): "FBS61", ("FBS", 67): "FBS67", ("FBS", 68): "FBS",
+                     ("cxr", 62): "CXR62", ("cxr", 68): "CXR", ("mchc", 68): "MCHC"}
+
+
+def test_new_year_columns_keep_schema_year_of_plain_columns():
+    # เพิ่มคอลัมน์ปี 69 แล้ว "น้ำหนัก"/"CXR" ยังเป็นปี 68 ไม่ใช่ปี 70
+    assert discover_columns(["น้ำหนัก61", "น้ำหนัก67", "น้ำหนัก", "น้ำหนัก69"]) == {
+        ("weight", 61): "น้ำหนัก61", ("weight", 67): "น้ำหนัก67", ("weight", 68): "น้ำหนัก", ("weight", 69): "น้ำหนัก69",
+    }
+    assert discover_columns(["CXR61", "CXR", "CXR69"]) == {("cxr", 61): "CXR61", ("cxr", 68): "CXR", ("cxr", 69): "CXR69"}
+    # ไม่มีปีใน schema: ปีถัดจากคอลัมน์มีเลขล่าสุด
+    assert discover_columns(["FBS61", "FBS67", "FBS"])[("FBS", 68)] == "FBS"
+
+
+def test_unknown_columns_do_not_add_years():
+    # เลขท้ายชื่อของคอลัมน์ที่ไม่อยู่ใน schema ไม่ใช่ปี และคอลัมน์ไม่มีเลขที่ชื่อซ้ำกับฐานของมันก็ไม่ใช่ปีถัดไป
+    df = generate(20, seed=1)
+    df["เบอร์โทร81"] = "0812345678"
+    df["ห้อง55"] = "A"
+    df["ห้อง"] = "B"
+    store = MetricStore(prepare_frame(records_to_frame(df.to_dict("records"))))
+    assert store.years == MetricStore(prepare_frame(records_to_frame(generate(20, seed=1).to_dict("records")))).years
+    assert max(store.years) == 68
@@ -0,0 +1,142 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# ==================== STAGE TIMING ====================
+# จับเวลาแต่ละขั้น (ดึงชีต แปลงข้อมูล ค้นหา สร้างรายงาน แสดงผล) เก็บ N ครั้งล่าสุดต่อขั้น
+# เปิดด้วย STAGE_TIMING=1 ปิดอยู่ (ค่าเริ่มต้น) decorator คืนฟังก์ชันเดิมและ stage() เป็น no-op
+# STAGE_TIMING_EXPORT=/path/stages.prom (หรือ .json) เขียนไฟล์ทุก STAGE_TIMING_EXPORT_INTERVAL วินาที
+
+STAGE_TIMING = os.environ.get("STAGE_TIMING", "0") == "1"
+STAGE_TIMING_WINDOW = 1000
+STAGE_TIMING_EXPORT = os.environ.get("STAGE_TIMING_EXPORT", "")
+STAGE_TIMING_EXPORT_INTERVAL = 60
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer:
+    def __init__(self, enabled=STAGE_TIMING, window=STAGE_TIMING_WINDOW,
+                 export_path=STAGE_TIMING_EXPORT, export_interval=STAGE_TIMING_EXPORT_INTERVAL):
+        self.enabled = enabled
+        self.window = window
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self._samples = {}  # ขั้น -> deque ของวินาที (rolling)
+        self._totals = {}  # ขั้น -> [จำนวนครั้ง, เวลารวม] ตั้งแต่เริ่มโปรเซส
+        self._lock = threading.Lock()
+        self._last_export = time.monotonic()
+
+    def stage(self, name):
+        # with timer.stage("fetch"): ...
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def timed(self, name):
+        # decorator: ตอนปิดคืนฟังก์ชันเดิม ไม่มี overhead ต่อการเรียก
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._totals[name] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+            due = self.export_path and time.monotonic() - self._last_export >= self.export_interval
+            if due:
+                self._last_export = time.monotonic()
+        if due:
+            self.export()
+
+    def summary(self):
+        # {ขั้น: {count, total_s, p50_ms, p90_ms, p99_ms, max_ms}} percentile จาก window ล่าสุด
+        with self._lock:
+            snapshot = {name: (np.array(samples), tuple(self._totals[name])) for name, samples in self._samples.items()}
+        out = {}
+        for name, (samples, (count, total)) in sorted(snapshot.items()):
+            stats = {"count": count, "total_s": total}
+            for q, value in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+                stats[f"p{round(q * 100)}_ms"] = value * 1e3
+            stats["max_ms"] = samples.max() * 1e3
+            out[name] = stats
+        return out
+
+    def to_prometheus(self, prefix="health_report_stage"):
+        lines = [
+            f"# HELP {prefix}_seconds Time spent per stage (quantiles over the last {self.window} runs).",
+            f"# TYPE {prefix}_seconds summary",
+        ]
+        for name, stats in self.summary().items():
+            for q in QUANTILES:
+                value = stats[f"p{round(q * 100)}_ms"] / 1e3
+                lines.append(f'{prefix}_seconds{{stage="{name}",quantile="{q}"}} {value:.6g}')
+            lines.append(f'{prefix}_seconds_sum{{stage="{name}"}} {stats["total_s"]:.6g}')
+            lines.append(f'{prefix}_seconds_count{{stage="{name}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps({"pid": os.getpid(), "time": time.time(), "stages": self.summary()}, indent=2)
+
+    def export(self, path=None):
+        # .json = JSON อื่น ๆ = Prometheus text format (ใช้กับ node_exporter textfile collector ได้)
+        path = path or self.export_path
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # เขียนไฟล์ไม่ได้ไม่ควรทำให้รายงานล่ม
+        return path
+
+
+timer = StageTimer()
+stage = timer.stage
+timed = timer.timed
@@ -0,0 +1,99 @@
+import io
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from ranges import reference
+
+# ==================== TREND ====================
+# ค่าทุกปีของคนเดียว: ดึงจาก MetricStore ครั้งเดียว (numbers[แถว] = [ตัวชี้วัด, ปี]) แล้ววาดกราฟเล็กหลายช่อง
+# จุดที่อยู่นอกเกณฑ์เป็นสีแดง ใช้ Figure ตรง ๆ (ไม่ผ่าน pyplot) จึงไม่มี state กลางระหว่าง session
+# ชื่อกราฟเป็นภาษาอังกฤษ: ฟอนต์ของ matplotlib บนเซิร์ฟเวอร์ไม่มีอักษรไทย
+
+# (ช่อง, [ตัวชี้วัด], ชื่อกราฟ) sbp/dbp อยู่ช่องเดียวกัน
+TREND_PANELS = [
+    ("weight", ["weight"], "Weight (kg)"),
+    ("bmi", ["bmi"], "BMI (kg/m²)"),
+    ("bp", ["sbp", "dbp"], "Blood pressure (mmHg)"),
+    ("FBS", ["FBS"], "FBS (mg/dl)"),
+    ("Cholesterol", ["Cholesterol"], "Cholesterol (mg/dl)"),
+    ("LDL", ["LDL"], "LDL (mg/dl)"),
+    ("HDL", ["HDL"], "HDL (mg/dl)"),
+    ("TG", ["TG"], "Triglyceride (mg/dl)"),
+    ("GFR", ["GFR"], "GFR (mL/min)"),
+    ("Cr", ["Cr"], "Creatinine (mg/dl)"),
+    ("Uric", ["Uric"], "Uric acid (mg%)"),
+    ("SGOT", ["SGOT"], "SGOT (U/L)"),
+    ("SGPT", ["SGPT"], "SGPT (U/L)"),
+    ("hb", ["hb"], "Hemoglobin (g/dl)"),
+    ("wbc", ["wbc"], "WBC (/cu.mm)"),
+    ("plt", ["plt"], "Platelet (/cu.mm)"),
+]
+TREND_COLUMNS = 4
+TREND_CACHE_SIZE = 64  # PNG ละ ~200 KB
+LINE_COLORS = ["#00796B", "#5C6BC0"]  # เส้นที่สองในช่องเดียวกัน เช่น dbp
+ABNORMAL_COLOR = "#C62828"
+
+# เกณฑ์ที่ไม่อยู่ใน ranges.py (ตรงกับ interpret_bmi / interpret_bp)
+_BMI_NORMAL = (18.5, 23)
+_BP_HIGH = {"sbp": 140, "dbp": 90}
+
+
+def person_trends(store, row):
+    """ค่าตัวเลขทุกตัวชี้วัดทุกปีของแถวเดียว DataFrame index = ปี คอลัมน์ = ตัวชี้วัด (+ bmi)"""
+    trends = pd.DataFrame(store.numbers_of(row).T, index=store.years, columns=store.number_metrics)
+    if {"weight", "height"} <= set(trends.columns):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bmi = trends["weight"] / (trends["height"] / 100) ** 2
+        trends["bmi"] = bmi.where(trends["height"] > 0)
+    return trends.replace(0, np.nan).dropna(how="all")
+
+
+def abnormal_points(metric, values, sex=""):
+    values = np.asarray(values, dtype=float)
+    if metric == "bmi":
+        low, high = _BMI_NORMAL
+        return (values < low) | (values >= high)
+    if metric in _BP_HIGH:
+        return values >= _BP_HIGH[metric]
+    try:
+        ranges = reference(metric, sex)
+    except KeyError:
+        return np.zeros(len(values), dtype=bool)  # ไม่มีเกณฑ์ เช่น น้ำหนัก
+    return (ranges.directions_of(values) != "normal") & ~np.isnan(values)
+
+
+def render_trends(trends, sex=""):
+    """PNG ของกราฟทุกช่องที่มีค่าอย่างน้อยหนึ่งปี (None = ไม่มีข้อมูลเลย)"""
+    panels = [(name, [m for m in metrics if m in trends and trends[m].notna().any()], title)
+              for name, metrics, title in TREND_PANELS]
+    panels = [panel for panel in panels if panel[1]]
+    if not panels:
+        return None
+    rows = -(-len(panels) // TREND_COLUMNS)
+    # จัดระยะเองด้วย subplots_adjust: layout="constrained" ช้ากว่าหลายเท่าตอน savefig
+    figure = Figure(figsize=(TREND_COLUMNS * 3.2, rows * 2.4), dpi=100)
+    figure.subplots_adjust(left=0.05, right=0.98, top=1 - 0.35 / rows, bottom=0.25 / rows, wspace=0.3, hspace=0.45)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(rows, TREND_COLUMNS, squeeze=False).ravel()
+    years = trends.index.to_numpy() + 2500
+    for ax, (_, metrics, title) in zip(axes, panels):
+        for metric, color in zip(metrics, LINE_COLORS):
+            values = trends[metric].to_numpy()
+            present = ~np.isnan(values)
+            ax.plot(years[present], values[present], color=color, linewidth=1.5, marker="o", markersize=4, label=metric)
+            flagged = abnormal_points(metric, values, sex) & present
+            ax.scatter(years[flagged], values[flagged], color=ABNORMAL_COLOR, s=36, zorder=3)
+        ax.set_title(title, fontsize=10)
+        if len(metrics) > 1:
+            ax.legend(fontsize=7, loc="best")
+        ax.set_xticks(years)
+        ax.tick_params(labelsize=7)
+        ax.grid(alpha=0.3)
+    for ax in axes[len(panels):]:
+        ax.set_visible(False)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()